@@ -0,0 +1,46 @@
+"""
+Cost of creating an instance with INJECTED attributes: the former subclass created per instance against setting
+the attributes between __new__ and __init__, and against lazy attributes created on first access.
+
+Run it with: python -m benchmarks.attribute_injection
+"""
+from timeit import timeit
+
+from tests.test_injector import Thing, Reality, config
+from wirinj import Definitions, Autowiring
+from wirinj.injector import Injector
+from wirinj.introspect import subclass_inject, new_inject
+
+
+def run(number=20000):
+    reality = Reality()
+    kwinject = {'reality': reality, 'cfg': 'DEF'}
+    inj = Injector(Definitions(config), Autowiring())
+    inj.get(Thing, 'param')
+    lazy_inj = Injector(Definitions(config), Autowiring(), lazy_attributes=True)
+    lazy_inj.get(Thing, 'param')
+
+    def direct():
+        thing = Thing('param')
+        thing.reality = reality
+        thing.cfg = 'DEF'
+        return thing
+
+    results = [
+        ('direct', direct),
+        ('subclass_inject', lambda: subclass_inject(Thing, ('param',), {}, kwinject)),
+        ('new_inject', lambda: new_inject(Thing, ('param',), {}, kwinject)),
+        ('injector.get', lambda: inj.get(Thing, 'param')),
+        ('lazy attributes', lambda: lazy_inj.get(Thing, 'param')),
+    ]
+
+    print('{:>16} {:>10} {:>10}'.format('', 'us / call', 'x direct'))
+    base = None
+    for name, func in results:
+        seconds = timeit(func, number=number)
+        base = base or seconds
+        print('{:>16} {:>10.2f} {:>10.1f}'.format(name, seconds / number * 1e6, seconds / base))
+
+
+if __name__ == '__main__':
+    run()
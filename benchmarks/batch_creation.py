@@ -0,0 +1,61 @@
+"""
+Per object cost of creating many instances of the same class, compared with a plain constructor loop.
+
+Run it with: python -m benchmarks.batch_creation
+"""
+from timeit import timeit
+from typing import Type
+
+from wirinj import Definitions, Singleton, Instance, Factory, INJECTED
+from wirinj.injector import Injector
+
+
+class Schema:
+    def __init__(self, fields):
+        self.fields = fields
+
+
+class Record:
+    def __init__(self, row, schema: Schema):
+        self.row = row
+        self.schema = schema
+
+
+class Loader:
+    record_factory: Type[Record] = INJECTED
+
+
+def build_injector(**kwargs):
+    return Injector(Definitions({
+        'fields': ('id', 'name'),
+        Schema: Singleton(),
+        Record: Instance(),
+        Loader: Instance(),
+        Type[Record]: Factory(),
+    }), **kwargs)
+
+
+def run(count=20000):
+    rows = [(i,) for i in range(count)]
+    schema = Schema(('id', 'name'))
+    inj = build_injector()
+    jit = build_injector(jit=True)
+    factory = inj.get(Loader).record_factory
+
+    results = [
+        ('constructor', timeit(lambda: [Record(row, schema) for row in rows], number=1)),
+        ('get loop', timeit(lambda: [inj.get(Record, row) for row in rows], number=1)),
+        ('factory loop', timeit(lambda: [factory(row) for row in rows], number=1)),
+        ('get_many', timeit(lambda: inj.get_many(Record, [(row,) for row in rows]), number=1)),
+        ('get_many jit', timeit(lambda: jit.get_many(Record, [(row,) for row in rows]), number=1)),
+        ('factory.many', timeit(lambda: factory.many([(row,) for row in rows]), number=1)),
+    ]
+
+    base = results[0][1]
+    print('{:>14} {:>14} {:>10}'.format('', 'us / object', 'x direct'))
+    for name, seconds in results:
+        print('{:>14} {:>14.2f} {:>10.1f}'.format(name, seconds / count * 1e6, seconds / base))
+
+
+if __name__ == '__main__':
+    run()
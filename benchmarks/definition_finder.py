@@ -0,0 +1,95 @@
+"""
+Compares the indexed DefinitionFinder against the former linear scan over every definition.
+
+Run it with: python -m benchmarks.definition_finder
+"""
+from random import Random
+from timeit import timeit
+from typing import Dict, List
+
+from wirinj.core import Arg, NotSet
+from wirinj.definition import DefinitionFinder
+
+
+class LinearDefinitionFinder:
+    """The finder as it was before the suffix index: every key is compared against the creation path."""
+
+    def __init__(self, definitions: Dict):
+        self.definitions = definitions
+
+    def __call__(self, creation_path: List[Arg]):
+
+        result_key = None
+        result_value = None
+        def_len = 0
+
+        for key, value in self.definitions.items():
+            definition = key if isinstance(key, list) or isinstance(key, tuple) else (key,)
+
+            if len(definition) > len(creation_path):
+                continue
+
+            if len(definition) <= def_len:
+                continue
+
+            match = True
+            for i, def_item in enumerate(reversed(definition)):
+                path_item = creation_path[-i - 1]
+                if not (isinstance(def_item, str) and def_item == path_item.name or def_item == path_item.cls):
+                    match = False
+                    break
+            if match:
+                result_key = key
+                result_value = value
+                def_len = len(definition)
+
+        return (NotSet, NotSet) if def_len == 0 else (result_key, result_value)
+
+
+def build_definitions(size: int, rnd: Random):
+    classes = [type('Cls{}'.format(i), (), {}) for i in range(max(size // 3, 1))]
+
+    defs = {}
+    while len(defs) < size:
+        kind = rnd.randrange(3)
+        cls = rnd.choice(classes)
+        if kind == 0:
+            defs[cls] = len(defs)
+        elif kind == 1:
+            defs[(cls, 'arg{}'.format(rnd.randrange(5)))] = len(defs)
+        else:
+            defs[(rnd.choice(classes), cls, 'arg{}'.format(rnd.randrange(5)))] = len(defs)
+    return classes, defs
+
+
+def build_paths(classes, count: int, depth: int, rnd: Random):
+    paths = []
+    for _ in range(count):
+        path = tuple(Arg('arg{}'.format(rnd.randrange(5)), rnd.choice(classes)) for _ in range(depth))
+        paths.append(path)
+    return paths
+
+
+def run(sizes=(10, 1000, 50000), lookups=50, depth=6):
+    rnd = Random(0)
+    print('{:>12} {:>16} {:>16} {:>10}'.format('definitions', 'linear (us)', 'indexed (us)', 'speedup'))
+    for size in sizes:
+        classes, defs = build_definitions(size, rnd)
+        paths = build_paths(classes, lookups, depth, rnd)
+
+        linear = LinearDefinitionFinder(defs)
+        indexed = DefinitionFinder(defs)
+
+        for path in paths:
+            assert linear(path) == indexed(path)
+
+        number = max(1, 20000 // size)
+        linear_time = timeit(lambda: [linear(path) for path in paths], number=number) / number / lookups
+        indexed_time = timeit(lambda: [indexed(path) for path in paths], number=number) / number / lookups
+
+        print('{:>12} {:>16.2f} {:>16.2f} {:>9.0f}x'.format(
+            size, linear_time * 1e6, indexed_time * 1e6, linear_time / indexed_time))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,63 @@
+"""
+Cost of a call to an injected Type[T] factory, compared with calling the constructor directly.
+
+Run it with: python -m benchmarks.factory_call
+"""
+from timeit import timeit
+from typing import Type
+
+from examples.pet_delivery.classes import Wheel, VehicleBuilder
+from examples.pet_delivery.defs import world_one
+from wirinj import Definitions, Singleton, Instance, Factory, INJECTED
+from wirinj.injector import Injector
+
+
+class Tyre:
+    def __init__(self, size, pressure):
+        self.size = size
+        self.pressure = pressure
+
+
+class Workshop:
+    tyre_factory: Type[Tyre] = INJECTED
+
+
+def build_direct_wheel():
+    wheel = Wheel()
+    wheel.mount_sound = 'pffff'
+    return wheel
+
+
+def run(number=20000):
+    inj = Injector(Definitions({
+        'pressure': 2.2,
+        Tyre: Instance(),
+        Workshop: Singleton(),
+        Type[Tyre]: Factory(),
+    }))
+    tyre_factory = inj.get(Workshop).tyre_factory
+
+    pet_injector = Injector(world_one)
+    wheel_factory = pet_injector.get(VehicleBuilder).wheel_factory
+
+    results = [
+        ('Tyre(16, 2.2)', lambda: Tyre(16, 2.2)),
+        ('injector.get', lambda: inj.get(Tyre, 16)),
+        ('tyre_factory(16)', lambda: tyre_factory(16)),
+        ('Wheel()', build_direct_wheel),
+        ('injector.get', lambda: pet_injector.get(Wheel)),
+        ('wheel_factory()', lambda: wheel_factory()),
+    ]
+
+    print('{:>18} {:>10} {:>10}'.format('', 'us / call', 'x direct'))
+    base = None
+    for i, (name, func) in enumerate(results):
+        func()
+        seconds = timeit(func, number=number)
+        if i % 3 == 0:
+            base = seconds
+        print('{:>18} {:>10.2f} {:>10.1f}'.format(name, seconds / number * 1e6, seconds / base))
+
+
+if __name__ == '__main__':
+    run()
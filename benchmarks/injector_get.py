@@ -0,0 +1,80 @@
+"""
+Cost of Injector.get for a small per request object graph, compared with calling the constructors directly.
+
+Run it with: python -m benchmarks.injector_get
+"""
+from timeit import timeit
+
+from wirinj import Definitions, Singleton, Instance
+from wirinj.injector import Injector
+
+
+class Config:
+    def __init__(self, timeout):
+        self.timeout = timeout
+
+
+class Repository:
+    def __init__(self, config: Config):
+        self.config = config
+
+
+class Validator:
+    def __init__(self, strict):
+        self.strict = strict
+
+
+class Service:
+    def __init__(self, repository: Repository, validator: Validator):
+        self.repository = repository
+        self.validator = validator
+
+
+class Handler:
+    def __init__(self, request, service: Service, validator: Validator):
+        self.request = request
+        self.service = service
+        self.validator = validator
+
+
+def build_definitions():
+    return Definitions({
+        'timeout': 30,
+        'strict': True,
+        Config: Singleton(),
+        Repository: Singleton(),
+        Validator: Instance(),
+        Service: Instance(),
+        Handler: Instance(),
+    })
+
+
+def build_directly(repository, request):
+    return Handler(request, Service(repository, Validator(True)), Validator(True))
+
+
+def run(number=20000):
+    repository = Repository(Config(30))
+    uncached = Injector(build_definitions(), cached=False)
+    planned = Injector(build_definitions())
+    jit = Injector(build_definitions(), jit=True)
+
+    for inj in (uncached, planned, jit):
+        handler = inj.get(Handler, 'request')
+        assert isinstance(handler.service.repository, Repository)
+
+    results = [
+        ('constructors', timeit(lambda: build_directly(repository, 'request'), number=number)),
+        ('not cached', timeit(lambda: uncached.get(Handler, 'request'), number=number // 20) * 20),
+        ('plan cache', timeit(lambda: planned.get(Handler, 'request'), number=number)),
+        ('jit', timeit(lambda: jit.get(Handler, 'request'), number=number)),
+    ]
+
+    base = results[0][1]
+    print('{:>14} {:>12} {:>10}'.format('', 'us / get', 'x direct'))
+    for name, seconds in results:
+        print('{:>14} {:>12.2f} {:>10.1f}'.format(name, seconds / number * 1e6, seconds / base))
+
+
+if __name__ == '__main__':
+    run()
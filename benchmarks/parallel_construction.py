@@ -0,0 +1,79 @@
+"""
+Wall-clock time of the first creation of a graph of slow singletons, serial against an injector with a thread pool
+executor, and of the same graph created by Injector.warmup. Constructors sleep to simulate blocking I/O, so the
+parallel time approaches the critical path.
+
+Run it with: python -m benchmarks.parallel_construction
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from wirinj import Definitions, Singleton
+from wirinj.injector import Injector
+
+DELAY = 0.05
+
+
+class Config:
+    def __init__(self):
+        time.sleep(DELAY)
+
+
+class Database:
+    def __init__(self, config: Config):
+        time.sleep(2 * DELAY)
+
+
+class Model:
+    def __init__(self, config: Config):
+        time.sleep(3 * DELAY)
+
+
+class Templates:
+    def __init__(self):
+        time.sleep(DELAY)
+
+
+class SearchIndex:
+    def __init__(self, database: Database):
+        time.sleep(DELAY)
+
+
+class App:
+    def __init__(self, database: Database, model: Model, templates: Templates, search_index: SearchIndex):
+        pass
+
+
+# Config -> Model
+CRITICAL_PATH = 4 * DELAY
+
+
+def get_definitions():
+    return Definitions({cls: Singleton() for cls in (Config, Database, Model, Templates, SearchIndex, App)})
+
+
+def measure(**kwargs):
+    inj = Injector(get_definitions(), **kwargs)
+    start = time.perf_counter()
+    inj.get(App)
+    return time.perf_counter() - start
+
+
+def run():
+    print('{:>14} {:>10}'.format('', 'ms'))
+    print('{:>14} {:>10.1f}'.format('critical path', CRITICAL_PATH * 1e3))
+    print('{:>14} {:>10.1f}'.format('serial', measure() * 1e3))
+    for workers in (2, 4, 8):
+        with ThreadPoolExecutor(workers) as executor:
+            print('{:>14} {:>10.1f}'.format('{} threads'.format(workers), measure(executor=executor) * 1e3))
+
+    print('{:>14} {:>10.1f}'.format('warmup', Injector(get_definitions()).warmup([App]).seconds * 1e3))
+    with ThreadPoolExecutor(8) as executor:
+        report = Injector(get_definitions()).warmup([App], executor)
+        print('{:>14} {:>10.1f}'.format('warmup 8 thr.', report.seconds * 1e3))
+    print()
+    print(report.get())
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,112 @@
+"""
+Resident memory of N forked workers using the same large singletons: created in each worker, created in the master
+with Injector.warmup, and created in the master with Injector.prefork, which also freezes them out of the garbage
+collector. Each worker runs a full collection, as it eventually would while serving requests, and then reports its
+shared and private memory from /proc/self/smaps_rollup (Linux only).
+
+Run it with: python -m benchmarks.prefork_memory
+"""
+import gc
+import os
+import sys
+
+from wirinj import Definitions, Singleton
+from wirinj.injector import Injector
+
+WORKERS = 4
+
+
+class LookupTable:
+    def __init__(self):
+        self.entries = {'key{}'.format(i): ('value{}'.format(i), i) for i in range(300000)}
+
+
+class Connection:
+    pass
+
+
+class App:
+    def __init__(self, lookup_table: LookupTable, connection: Connection):
+        self.lookup_table = lookup_table
+        self.connection = connection
+
+
+def get_injector():
+    return Injector(Definitions({
+        LookupTable: Singleton(),
+        Connection: Singleton(fork_safe=False),
+        App: Singleton(),
+    }))
+
+
+def read_memory():
+    """
+    @return: Shared and private resident memory of the current process in MB.
+    """
+    values = {}
+    with open('/proc/self/smaps_rollup') as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    shared = values.get('Shared_Clean', 0) + values.get('Shared_Dirty', 0)
+    private = values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    return shared, private
+
+
+def run_workers(inj):
+    pipes = []
+    for _ in range(WORKERS):
+        read, write = os.pipe()
+        pid = os.fork()
+        if not pid:
+            os.close(read)
+            inj.get(App)
+            gc.collect()
+            os.write(write, '{:.1f} {:.1f}'.format(*read_memory()).encode())
+            os._exit(0)
+        os.close(write)
+        pipes.append((pid, read))
+
+    results = []
+    for pid, read in pipes:
+        results.append([float(value) for value in os.read(read, 100).split()])
+        os.close(read)
+        os.waitpid(pid, 0)
+    return results
+
+
+def measure(mode):
+    pid = os.fork()
+    if pid:
+        os.waitpid(pid, 0)
+        return
+
+    # A clean master process per mode
+    inj = get_injector()
+    if mode == 'warmup':
+        inj.warmup()
+    elif mode == 'prefork':
+        inj.prefork()
+    results = run_workers(inj)
+
+    shared = sum(result[0] for result in results) / len(results)
+    private = sum(result[1] for result in results) / len(results)
+    print('{:>10} {:>12.1f} {:>12.1f} {:>14.1f}'.format(mode, shared, private, private * WORKERS))
+    sys.stdout.flush()
+    os._exit(0)
+
+
+def run():
+    if not os.path.exists('/proc/self/smaps_rollup') or not hasattr(os, 'fork'):
+        print('Linux only')
+        return
+
+    print('{} workers, MB per worker'.format(WORKERS))
+    print('{:>10} {:>12} {:>12} {:>14}'.format('', 'shared', 'private', 'total private'))
+    for mode in ('worker', 'warmup', 'prefork'):
+        measure(mode)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,50 @@
+"""
+Overhead of calling a function through @inject, compared with a direct call with the same arguments.
+
+Run it with: python -m benchmarks.wrapped_call
+"""
+from timeit import timeit
+
+from wirinj import Definitions, Singleton, Instance, inject
+from wirinj.injector import Injector
+
+
+class Database:
+    pass
+
+
+class Session:
+    def __init__(self, database: Database):
+        self.database = database
+
+
+def handle(request, session: Session, database: Database):
+    return request
+
+
+def run(number=20000):
+    defs = Definitions({
+        Database: Singleton(),
+        Session: Instance(),
+    })
+    inj = Injector(defs)
+    wrapped = inject(injector=inj)(handle)
+    database = inj.get(Database)
+
+    results = [
+        ('direct', lambda: handle('request', Session(database), database)),
+        ('injector.call', lambda: inj.call(handle, 'request')),
+        ('@inject', lambda: wrapped('request')),
+    ]
+
+    print('{:>14} {:>10} {:>10}'.format('', 'us / call', 'x direct'))
+    base = None
+    for name, func in results:
+        func()
+        seconds = timeit(func, number=number)
+        base = base or seconds
+        print('{:>14} {:>10.2f} {:>10.1f}'.format(name, seconds / number * 1e6, seconds / base))
+
+
+if __name__ == '__main__':
+    run()
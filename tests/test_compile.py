@@ -0,0 +1,60 @@
+import logging
+import os
+from contextlib import redirect_stderr
+from importlib.util import spec_from_file_location, module_from_spec
+from io import StringIO
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from examples.pet_delivery.classes import Mike, Bob
+from examples.pet_delivery.defs import world_one
+from wirinj.compile import main
+from wirinj.injector import Injector
+
+
+def load_module(path):
+    spec = spec_from_file_location('wiring', path)
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_deliveries(get):
+    logger = logging.getLogger('examples.pet_delivery.classes')
+    log = StringIO()
+    handler = logging.StreamHandler(log)
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    del Mike.vehicles[:]
+    try:
+        get(Bob).deliver(30, 5, False)
+        get(Mike).deliver(60, 10, True)
+    finally:
+        logger.removeHandler(handler)
+        del Mike.vehicles[:]
+    return log.getvalue()
+
+
+class TestCompile(TestCase):
+
+    def test_generated_wiring_is_equivalent(self):
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'wiring.py')
+            self.assertEqual(main(['examples.pet_delivery.defs:world_one', '-o', path]), 0)
+            wiring = load_module(path)
+
+            expected = run_deliveries(Injector(world_one).get)
+            self.assertIn('Car is built', expected)
+            self.assertMultiLineEqual(run_deliveries(wiring.get), expected)
+            self.assertIs(wiring.get(Mike), wiring.get(Mike))
+
+    def test_check_mode(self):
+        with TemporaryDirectory() as tmp, redirect_stderr(StringIO()):
+            path = os.path.join(tmp, 'wiring.py')
+            self.assertEqual(main(['examples.pet_delivery.defs:world_one', '-o', path, '--check']), 1)
+            main(['examples.pet_delivery.defs:world_one', '-o', path])
+            self.assertEqual(main(['examples.pet_delivery.defs:world_one', '-o', path, '--check']), 0)
+
+            with open(path, 'a') as f:
+                f.write('# edited\n')
+            self.assertEqual(main(['examples.pet_delivery.defs:world_one', '-o', path, '--check']), 1)
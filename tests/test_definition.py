@@ -1,9 +1,13 @@
+import sys
 from unittest import TestCase
 
 from typing import Type
-from wirinj.definition import Instance, Definitions
-from wirinj import Autowiring
+from wirinj.core import Arg, NotSet, INJECTED
+from wirinj.definition import Instance, Definitions, DefinitionFinder, CustomInstance
+from wirinj import Autowiring, Injector, ANY, ANCESTORS, SubclassOf, ImportRef, Singleton, get_import_report
 from wirinj.decorators import inject
+from wirinj.imports import import_report
+from wirinj.spec import is_importable
 
 
 class TestAutowiring(TestCase):
@@ -31,3 +35,145 @@ class TestAutowiring(TestCase):
             self.assertIsInstance(horse, Horse)
 
         fn()
+
+
+class TestDefinitionFinder(TestCase):
+
+    def test_longest_match_wins(self):
+        class Cat:
+            pass
+
+        class Leg:
+            pass
+
+        finder = DefinitionFinder({
+            'sound': 1,
+            (Cat, 'sound'): 2,
+            (Leg, Cat, 'sound'): 3,
+            (Leg, 'sound'): 4,
+        })
+
+        self.assertEqual(finder((Arg(None, Cat), Arg('sound'))), ((Cat, 'sound'), 2))
+        self.assertEqual(finder((Arg(None, Leg), Arg('cat', Cat), Arg('sound'))), ((Leg, Cat, 'sound'), 3))
+        self.assertEqual(finder((Arg(None, Leg), Arg('sound'))), ((Leg, 'sound'), 4))
+        self.assertEqual(finder((Arg('sound'),)), ('sound', 1))
+        self.assertEqual(finder((Arg('noise'),)), (NotSet, NotSet))
+
+    def test_first_definition_wins_on_equal_length(self):
+        class Cat:
+            pass
+
+        finder = DefinitionFinder({
+            'cat': 1,
+            Cat: 2,
+            (Cat,): 3,
+        })
+
+        self.assertEqual(finder((Arg('cat', Cat),)), ('cat', 1))
+        self.assertEqual(finder((Arg('pet', Cat),)), (Cat, 2))
+
+
+class TestPatternDefinitions(TestCase):
+
+    def test_wildcard_ancestors_and_subclass(self):
+        class Pet:
+            pass
+
+        class Cat(Pet):
+            pass
+
+        class House:
+            pass
+
+        class Room:
+            pass
+
+        finder = DefinitionFinder({
+            (House, ANY, 'size'): 1,
+            (House, ANCESTORS, 'color'): 2,
+            (SubclassOf(Pet), 'sound'): 3,
+            (Cat, 'sound'): 4,
+        })
+
+        house = Arg(None, House)
+        room = Arg('room', Room)
+
+        self.assertEqual(finder((house, room, Arg('size')))[1], 1)
+        self.assertEqual(finder((house, Arg('size')))[1], NotSet)
+        self.assertEqual(finder((house, Arg('color')))[1], 2)
+        self.assertEqual(finder((house, room, room, Arg('color')))[1], 2)
+        self.assertEqual(finder((room, Arg('color')))[1], NotSet)
+        self.assertEqual(finder((Arg(None, Pet), Arg('sound')))[1], 3)
+        self.assertEqual(finder((Arg(None, Cat), Arg('sound')))[1], 3)
+
+    def test_patterns_through_injector(self):
+        class Engine:
+            mount_sound: str = INJECTED
+
+        class Plate(Engine):
+            pass
+
+        class Car:
+            engine: Engine = INJECTED
+            plate: Plate = INJECTED
+
+        injector = Injector(Definitions({
+            SubclassOf(Engine): Instance(),
+            Car: Instance(),
+            (Car, ANCESTORS, 'mount_sound'): 'car',
+            'mount_sound': 'default',
+        }))
+
+        car = injector.get(Car)
+        self.assertEqual(car.engine.mount_sound, 'car')
+        self.assertIsInstance(car.plate, Plate)
+        self.assertEqual(injector.get(Plate).mount_sound, 'default')
+
+
+class TestImportPathDefinitions(TestCase):
+
+    def test_classes_are_imported_on_demand(self):
+        module = 'examples.report.cat_example_classes'
+        sys.modules.pop(module, None)
+
+        class Owner:
+            def __init__(self, cat, head):
+                self.cat = cat
+                self.head = head
+
+        injector = Injector(Definitions({
+            Owner: Instance(),
+            'cat': Singleton(module + '.Cat'),
+            module + '.Cat': Instance(),
+            (module + '.Cat', ANCESTORS, module + '.Nail'): Singleton(),
+            'head': ImportRef(module + ':Head'),
+        }), Autowiring())
+
+        self.assertNotIn(module, sys.modules)
+
+        owner = injector.get(Owner)
+
+        self.assertIn(module, sys.modules)
+        self.assertEqual(type(owner.cat).__name__, 'Cat')
+        self.assertIs(owner.head, sys.modules[module].Head)
+        self.assertIn(module, get_import_report())
+
+        # Resolutions that import nothing new are not reported
+        entries = len(import_report.entries)
+        ImportRef(module + '.Cat').resolve()
+        self.assertTrue(is_importable(type(owner.cat)))
+        self.assertEqual(len(import_report.entries), entries)
+        self.assertEqual(get_import_report().count(module + '.Cat:'), 1)
+
+    def test_reexported_names(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        class Worker:
+            def __init__(self, executor: ThreadPoolExecutor):
+                self.executor = executor
+
+        injector = Injector(Definitions({
+            Worker: Instance(),
+            'concurrent.futures:ThreadPoolExecutor': CustomInstance(lambda: 'executor'),
+        }))
+        self.assertEqual(injector.get(Worker).executor, 'executor')
@@ -1,8 +1,30 @@
-from unittest import TestCase
+import asyncio
+import gc
+import linecache
+import os
+import pickle
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from tempfile import TemporaryDirectory
+from threading import Lock
+from types import GeneratorType
+from typing import Type, get_type_hints
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+from weakref import ref
 
-from wirinj import Autowiring, Definitions
+from wirinj import Autowiring, Definitions, Singleton, Instance, Factory, CustomInstance, CustomSingleton, inject, \
+    BackgroundSingleton, Scoped, Lazy, Persistent, MappedFile, get_worker_injector
 from wirinj.core import INJECTED
+from wirinj.dependencies import SingletonWrapper, InstanceDependency
+from wirinj.errors import WirinjError, MissingDependenciesError
+from wirinj.proxy import Proxy, is_resolved, resolve_proxy
 from wirinj.injector import Injector
+from wirinj.introspect import collect_class_dependencies, use_metadata_cache
+from wirinj.metadata import MetadataCache
+from wirinj.plan import ResolutionPlan
 
 
 class Reality(object):
@@ -35,3 +57,1095 @@ class TestInjector(TestCase):
         self.assertIsInstance(thing.reality, Reality)
         self.assertEqual(thing.not_injected, 'ABC')
         self.assertEqual(thing.cfg, 'DEF')
+        self.assertIs(type(thing), Thing)
+
+    def test_field_injection_with_metaclass(self):
+        class Counting(type):
+            calls = 0
+
+            def __call__(cls, *args, **kwargs):
+                Counting.calls += 1
+                return super().__call__(*args, **kwargs)
+
+        class CountedThing(Thing, metaclass=Counting):
+            pass
+
+        inj = Injector(Definitions(config), Autowiring())
+        thing = inj.get(CountedThing, 'my-param')
+        thing = inj.get(CountedThing, 'my-param')
+        self.assertEqual(Counting.calls, 2)
+        self.assertEqual((thing.param, thing.cfg), ('my-param', 'DEF'))
+        self.assertIsInstance(thing.reality, Reality)
+        self.assertIs(type(thing), CountedThing)
+        # The injecting subclass is created once
+        self.assertEqual(len(CountedThing.__subclasses__()), 1)
+
+    def test_field_injection_with_caching_metaclass(self):
+        class Cached(type):
+            instances = {}
+
+            def __call__(cls, *args, **kwargs):
+                if args not in Cached.instances:
+                    Cached.instances[args] = super().__call__(*args, **kwargs)
+                return Cached.instances[args]
+
+        class CachedThing(Thing, metaclass=Cached):
+            pass
+
+        inj = Injector(Definitions(config), Autowiring())
+        first = inj.get(CachedThing, 'a')
+        self.assertIs(inj.get(CachedThing, 'a'), first)
+        second = inj.get(CachedThing, 'b')
+        self.assertEqual((first.param, second.param, second.cfg), ('a', 'b', 'DEF'))
+
+
+class Palette:
+    color: str = INJECTED
+
+
+class Painter:
+    palette: Palette = INJECTED
+
+
+class Brush:
+    pass
+
+
+class Sketch:
+    brush: Brush = INJECTED
+
+    def __init__(self, title, palette: Palette, size=1):
+        self.title = title
+        self.palette = palette
+        self.size = size
+
+
+class Studio:
+    sketch_factory: Type[Sketch] = INJECTED
+
+
+class TestOverride(TestCase):
+
+    def test_only_dependent_singletons_are_rebuilt(self):
+        defs = Definitions({
+            'color': 'red',
+            Palette: Singleton(),
+            Painter: Singleton(),
+            Brush: Singleton(),
+        })
+        inj = Injector(defs)
+
+        painter = inj.get(Painter)
+        brush = inj.get(Brush)
+        self.assertEqual(painter.palette.color, 'red')
+
+        inj.override('color', 'blue')
+        new_painter = inj.get(Painter)
+        self.assertIsNot(new_painter, painter)
+        self.assertEqual(new_painter.palette.color, 'blue')
+        self.assertIs(inj.get(Brush), brush)
+        self.assertIs(inj.get(Painter), new_painter)
+
+        defs.add((Palette, 'color'), 'green')
+        self.assertEqual(inj.get(Painter).palette.color, 'green')
+
+        defs.remove((Palette, 'color'))
+        self.assertEqual(inj.get(Painter).palette.color, 'blue')
+        self.assertIs(inj.get(Brush), brush)
+
+
+def paint_with(palette: Palette):
+    return palette.color
+
+
+class TestResolutionPlans(TestCase):
+
+    def create_injector(self, **kwargs):
+        return Injector(Definitions({
+            'color': 'red',
+            Palette: Singleton(),
+            Brush: Instance(),
+            Sketch: Instance(),
+            Studio: Instance(),
+            Type[Sketch]: Factory(),
+        }), **kwargs)
+
+    def check_plans(self, inj):
+        first = inj.get(Sketch, 'first')
+        self.assertEqual((inj.plans.hits, inj.plans.misses, len(inj.plans)), (0, 1, 1))
+
+        second = inj.get(Sketch, 'second')
+        self.assertEqual((inj.plans.hits, inj.plans.misses), (1, 1))
+        self.assertEqual(second.title, 'second')
+        self.assertEqual(second.size, 1)
+        self.assertIs(second.palette, first.palette)
+        self.assertIsInstance(second.brush, Brush)
+        self.assertIsNot(second.brush, first.brush)
+
+        # An injectable keyword argument is only direct if it differs from the default, so there is no plan
+        self.assertEqual(inj.get(Sketch, 'third', size=5).size, 5)
+        self.assertEqual(inj.get(Sketch, 'third', size=5).size, 5)
+        self.assertEqual((inj.plans.hits, inj.plans.misses, len(inj.plans)), (1, 3, 1))
+
+        inj.override('color', 'blue')
+        self.assertEqual(len(inj.plans), 0)
+        self.assertEqual(inj.get(Sketch, 'fourth').palette.color, 'blue')
+        self.assertEqual(inj.get(Sketch, 'fifth').palette.color, 'blue')
+
+        inj.plans.clear()
+        self.assertEqual(len(inj.plans), 0)
+
+    def test_plans(self):
+        self.check_plans(self.create_injector())
+
+    def test_compiled_plans(self):
+        inj = self.create_injector(jit=True)
+        self.check_plans(inj)
+        self.assertTrue(inj.get(Sketch, 'sixth') and inj.get(Sketch, 'seventh'))
+        self.assertIn('get_Sketch', inj.plans.get((Sketch, 1, ())).__source__)
+
+        # The source of the dropped plans is released
+        sources = len(linecache.cache)
+        for color in ('green', 'blue', 'green'):
+            inj.override('color', color)
+            inj.get(Sketch, 'eighth')
+        gc.collect()
+        self.assertLessEqual(len(linecache.cache), sources)
+
+    def test_factory_calls_run_the_compiled_plan(self):
+        inj = self.create_injector()
+        factory = inj.get(Studio).sketch_factory
+
+        first = factory('first')
+        self.assertIn((Sketch, 1, ()), inj.plans.compiled)
+        hits = inj.plans.hits
+        second = factory('second')
+        self.assertEqual(inj.plans.hits, hits)
+        self.assertEqual(second.title, 'second')
+        self.assertIs(second.palette, first.palette)
+
+        inj.override('color', 'blue')
+        self.assertEqual(factory('third').palette.color, 'blue')
+        self.assertEqual(factory('fourth').palette.color, 'blue')
+
+    def test_nothing_compiled_without_jit(self):
+        inj = self.create_injector()
+        sketch_factory = inj.get(Studio).sketch_factory
+        for title in ('first', 'second'):
+            sketch_factory(title)
+        inj.get_many(Sketch, [('a',), ('b',)])
+        wrapper = inj.get_wrapper(paint_with)
+        self.assertEqual((wrapper(), wrapper()), ('red', 'red'))
+
+        self.assertGreater(len(inj.plans.compiled), 0)
+        self.assertTrue(all(isinstance(runner, ResolutionPlan) for runner in inj.plans.compiled.values()))
+
+    def test_no_plans_without_cache(self):
+        inj = self.create_injector(cached=False)
+        self.assertIsNone(inj.plans)
+        self.assertEqual(inj.get(Sketch, 'first').palette.color, 'red')
+
+    def test_closures_are_released(self):
+        inj = self.create_injector()
+        closures = []
+        for i in range(10):
+            def paint(palette: Palette, number=i):
+                return palette.color, number
+            self.assertEqual(inj.call(paint), ('red', i))
+            closures.append(ref(paint))
+        del paint
+        gc.collect()
+        self.assertEqual([closure for closure in closures if closure() is not None], [])
+
+        # Module functions keep their plan
+        inj.call(paint_with)
+        self.assertEqual(inj.call(paint_with), 'red')
+        self.assertIn((paint_with, 0, ()), inj.plans.runners)
+
+
+class TestGetMany(TestCase):
+
+    def test_many_instances(self):
+        inj = Injector(Definitions({
+            'color': 'red',
+            Palette: Singleton(),
+            Brush: Instance(),
+            Sketch: Instance(),
+            Studio: Instance(),
+            Type[Sketch]: Factory(),
+        }))
+
+        sketches = inj.get_many(Sketch, [('a',), ('b',), ('c',)])
+        self.assertEqual([sketch.title for sketch in sketches], ['a', 'b', 'c'])
+        self.assertIs(sketches[0].palette, sketches[2].palette)
+        self.assertIsNot(sketches[0].brush, sketches[1].brush)
+
+        stream = inj.get_many(Sketch, (('title {}'.format(i),) for i in range(3)), stream=True)
+        self.assertIsInstance(stream, GeneratorType)
+        self.assertEqual([sketch.title for sketch in stream], ['title 0', 'title 1', 'title 2'])
+
+        factory = inj.get(Studio).sketch_factory
+        self.assertEqual([sketch.title for sketch in factory.many([('x',), ('y',)])], ['x', 'y'])
+        self.assertEqual(next(factory.many((('z',) for _ in range(4)), stream=True)).title, 'z')
+        self.assertIsInstance(inj.get_many(Brush, 3)[2], Brush)
+
+
+class Gallery:
+    sketch_factory: Type[Sketch] = INJECTED
+    studio: Studio = INJECTED
+
+
+class TestFactoryKinds(TestCase):
+
+    def create_injector(self, kind):
+        return Injector(Definitions({
+            'color': 'red',
+            Palette: Singleton(),
+            Brush: Instance(),
+            Sketch: Instance(),
+            Studio: Instance(),
+            Gallery: Instance(),
+            Type[Sketch]: Factory(kind=kind),
+        }))
+
+    def test_factories_are_shared(self):
+        inj = self.create_injector('subclass')
+        gallery = inj.get(Gallery)
+        self.assertIs(gallery.sketch_factory, gallery.studio.sketch_factory)
+        self.assertTrue(issubclass(gallery.sketch_factory, Sketch))
+        self.assertIsInstance(gallery.sketch_factory('title'), Sketch)
+
+        # Not kept by the injector once they are not used
+        inj.override(Type[Sketch], Factory(kind='function'))
+        del gallery
+        gc.collect()
+        self.assertEqual(len(inj.factories), 0)
+
+    def test_function_factory(self):
+        inj = self.create_injector('function')
+        factory = inj.get(Gallery).sketch_factory
+        self.assertNotIsInstance(factory, type)
+        self.assertEqual(factory('title').title, 'title')
+        self.assertEqual(len(factory.many([('a',), ('b',)])), 2)
+
+
+class TestMetadataCache(TestCase):
+
+    def tearDown(self):
+        use_metadata_cache(None)
+
+    def test_dependencies_are_restored_from_disk(self):
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'wirinj.cache')
+
+            active = use_metadata_cache(path)
+            inj = Injector(Definitions(config), Autowiring())
+            self.assertIsInstance(inj.get(Thing, 'my-param'), Thing)
+            self.assertGreater(active.misses, 0)
+            active.save()
+
+            cache = MetadataCache(path, autosave=False)
+            self.assertEqual(cache.get_class_dependencies(Thing, collect_class_dependencies),
+                             collect_class_dependencies(Thing))
+            self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+            # A modified source file invalidates its entries
+            cache = MetadataCache(path, autosave=False)
+            cache.file_stamps[sys.modules[__name__].__file__] = (0, 0)
+            cache.get_class_dependencies(Thing, collect_class_dependencies)
+            self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_warm_start_skips_introspection(self):
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'wirinj.cache')
+            cold = use_metadata_cache(MetadataCache(path, autosave=False))
+            Injector(Definitions(config), Autowiring()).get(Thing, 'my-param')
+            cold.save()
+
+            use_metadata_cache(MetadataCache(path, autosave=False))
+            with patch('wirinj.introspect.get_type_hints', wraps=get_type_hints) as type_hints:
+                thing = Injector(Definitions(config), Autowiring()).get(Thing, 'my-param')
+            self.assertEqual(thing.cfg, 'DEF')
+            type_hints.assert_not_called()
+
+    def test_default_objects_are_kept(self):
+        script = '\n'.join([
+            'import sys',
+            'from wirinj import Definitions, Instance, use_metadata_cache',
+            'from wirinj.injector import Injector',
+            'from sentinel_client import Client',
+            'use_metadata_cache(sys.argv[1])',
+            'print(Injector(Definitions({Client: Instance()})).get(Client).missing)',
+        ])
+        with TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, 'sentinel_client.py'), 'w') as f:
+                f.write('_MISSING = object()\n\n'
+                        'class Client:\n'
+                        '    def __init__(self, timeout=_MISSING):\n'
+                        '        self.missing = timeout is _MISSING\n')
+
+            root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            env = {**os.environ, 'PYTHONPATH': os.pathsep.join([tmp, root])}
+            path = os.path.join(tmp, 'wirinj.cache')
+            for _ in range(2):
+                output = subprocess.check_output([sys.executable, '-c', script, path], env=env)
+                self.assertEqual(output.strip(), b'True')
+
+
+class Connection:
+    def __init__(self, url):
+        self.url = url
+
+
+class Repository:
+    def __init__(self, connection: Connection, cache: Palette):
+        self.connection = connection
+        self.cache = cache
+
+
+class TestAsync(TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.connections = 0
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    async def connect(self, url):
+        self.connections += 1
+        await asyncio.sleep(0.01)
+        return Connection(url)
+
+    async def create_palette(self):
+        await asyncio.sleep(0.05)
+        return Palette()
+
+    def get_injector(self):
+        return Injector(Definitions({
+            'url': 'db://',
+            Connection: CustomSingleton(self.connect),
+            Palette: CustomInstance(self.create_palette),
+            Repository: Instance(),
+        }))
+
+    def test_singletons_are_created_once(self):
+        inj = self.get_injector()
+
+        async def get_repositories():
+            return await asyncio.gather(*(inj.aget(Repository) for _ in range(5)))
+
+        repositories = self.run_async(get_repositories())
+        self.assertEqual(self.connections, 1)
+        self.assertEqual(len({id(repository.connection) for repository in repositories}), 1)
+        self.assertEqual(len({id(repository.cache) for repository in repositories}), 5)
+        self.assertEqual(repositories[0].connection.url, 'db://')
+
+    def test_dependencies_are_created_concurrently(self):
+        inj = self.get_injector()
+
+        async def use(connection: Connection, first: Palette, second: Palette):
+            return connection, first, second
+
+        start = self.loop.time()
+        connection, first, second = self.run_async(inj.acall(use))
+        self.assertLess(self.loop.time() - start, 0.09)
+        self.assertIsInstance(connection, Connection)
+        self.assertIsNot(first, second)
+
+    def test_inject_coroutine_function(self):
+        inj = self.get_injector()
+
+        @inject(injector=inj)
+        async def get_url(prefix, connection: Connection):
+            return prefix + connection.url
+
+        self.assertTrue(asyncio.iscoroutinefunction(get_url))
+        self.assertEqual(self.run_async(get_url('url: ')), 'url: db://')
+        self.assertEqual(self.run_async(get_url('url: ')), 'url: db://')
+        self.assertEqual(self.connections, 1)
+
+    def test_sync_get_needs_created_async_dependencies(self):
+        inj = self.get_injector()
+        with self.assertRaises(WirinjError):
+            inj.get(Connection)
+
+        connection = self.run_async(inj.aget(Connection))
+        self.assertIs(inj.get(Connection), connection)
+        with self.assertRaises(WirinjError):
+            inj.get(Repository)
+
+
+class Index:
+    builds = 0
+
+    def __init__(self):
+        Index.builds += 1
+        time.sleep(0.05)
+
+
+class Search:
+    def __init__(self, index: Index):
+        time.sleep(0.05)
+        self.index = index
+
+
+class Ranking:
+    def __init__(self, index: Index):
+        time.sleep(0.05)
+        self.index = index
+
+
+class Engine:
+    def __init__(self, search: Search, ranking: Ranking, brush: Brush, name='engine'):
+        self.search = search
+        self.ranking = ranking
+        self.name = name
+
+
+class BrokenRanking:
+    def __init__(self):
+        raise ValueError('broken')
+
+
+class TestExecutor(TestCase):
+
+    def setUp(self):
+        Index.builds = 0
+        self.executor = ThreadPoolExecutor(2)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def get_injector(self, *definitions, **kwargs):
+        # The same singleton for every creation path
+        index = SingletonWrapper(InstanceDependency(Index))
+        return Injector(Definitions({
+            Index: index,
+            Search: Singleton(),
+            Ranking: Singleton(),
+            Brush: Instance(),
+            Engine: Instance(),
+        }, *definitions), executor=self.executor, **kwargs)
+
+    def test_siblings_are_created_concurrently(self):
+        inj = self.get_injector()
+
+        start = time.perf_counter()
+        engine = inj.get(Engine)
+        self.assertLess(time.perf_counter() - start, 0.145)
+
+        # The shared singleton is created once
+        self.assertEqual(Index.builds, 1)
+        self.assertIs(engine.search.index, engine.ranking.index)
+        self.assertIs(inj.get(Engine).search, engine.search)
+
+    def test_errors_are_raised(self):
+        inj = self.get_injector({Ranking: CustomSingleton(BrokenRanking)})
+        with self.assertRaises(ValueError):
+            inj.get(Engine)
+
+        inj = self.get_injector()
+        inj.override(Brush, Instance(Painter))
+        with self.assertRaises(MissingDependenciesError):
+            inj.get(Engine)
+
+
+class Vocabulary:
+    def __init__(self, size=3):
+        time.sleep(0.05)
+        self.words = ['word{}'.format(i) for i in range(size)]
+
+    def lookup(self, word):
+        return self.words.index(word)
+
+
+class Tokenizer:
+    def __init__(self, vocabulary: Vocabulary):
+        self.vocabulary = vocabulary
+
+
+class TestBackgroundSingleton(TestCase):
+
+    def test_proxy_waits_on_first_use(self):
+        start = time.perf_counter()
+        inj = Injector(Definitions({Vocabulary: BackgroundSingleton(), Tokenizer: Instance()}))
+        tokenizer = inj.get(Tokenizer)
+        self.assertLess(time.perf_counter() - start, 0.04)
+
+        self.assertIs(type(tokenizer.vocabulary), Proxy)
+        self.assertFalse(is_resolved(tokenizer.vocabulary))
+        self.assertEqual(tokenizer.vocabulary.lookup('word2'), 2)
+        self.assertIsInstance(tokenizer.vocabulary, Vocabulary)
+        self.assertIs(inj.get(Tokenizer).vocabulary, tokenizer.vocabulary)
+
+        report = inj.get_background_report()
+        self.assertIn('Vocabulary: ready in', report)
+        self.assertGreater(inj.background_singletons[0].get_status()[2], 0)
+
+    def test_future(self):
+        inj = Injector(Definitions({'size': 5, Vocabulary: BackgroundSingleton(proxy=False)}))
+        future = inj.get(Vocabulary)
+        self.assertEqual(len(future.result().words), 5)
+        self.assertTrue(inj.wait_background(0))
+
+    def test_failure(self):
+        inj = Injector(Definitions({Tokenizer: BackgroundSingleton()}))
+        self.assertFalse(inj.wait_background(1))
+        self.assertIn('Tokenizer: failed', inj.get_background_report())
+        with self.assertRaises(MissingDependenciesError):
+            inj.get(Tokenizer).vocabulary
+
+    def test_released_with_injector(self):
+        defs = Definitions({'size': 5, Vocabulary: BackgroundSingleton()})
+        inj = Injector(defs)
+        self.assertTrue(inj.wait_background(1))
+        inj_ref = ref(inj)
+        # The definitions keep the last injector
+        inj = Injector(defs)
+        self.assertTrue(inj.wait_background(1))
+        gc.collect()
+        self.assertIsNone(inj_ref())
+
+
+class Session:
+    def __init__(self, connection: Connection):
+        self.connection = connection
+
+
+class UserService:
+    def __init__(self, session: Session):
+        self.session = session
+
+
+class OrderService:
+    def __init__(self, session: Session, users: UserService):
+        self.session = session
+        self.users = users
+
+
+class TestScoped(TestCase):
+
+    def get_injector(self):
+        return Injector(Definitions({
+            'url': 'db://',
+            Connection: Singleton(),
+            Session: Scoped(),
+            UserService: Instance(),
+            OrderService: Instance(),
+        }))
+
+    def test_one_instance_per_scope(self):
+        inj = self.get_injector()
+
+        with inj.scope() as scope:
+            orders = inj.get(OrderService)
+            self.assertIs(orders.users.session, orders.session)
+            self.assertIs(inj.get(OrderService).session, orders.session)
+            self.assertEqual(len(scope), 1)
+
+        with inj.scope():
+            self.assertIsNot(inj.get(OrderService).session, orders.session)
+            self.assertIs(inj.get(OrderService).session.connection, orders.session.connection)
+
+        # Released in bulk
+        self.assertEqual(len(scope), 0)
+
+        with self.assertRaises(WirinjError):
+            inj.get(OrderService)
+
+    def test_threads_and_tasks(self):
+        inj = self.get_injector()
+
+        def handle_request():
+            with inj.scope():
+                return inj.get(OrderService).session, inj.get(UserService).session
+
+        with ThreadPoolExecutor(2) as executor:
+            results = list(executor.map(lambda _: handle_request(), range(4)))
+        self.assertEqual(len({id(first) for first, _ in results}), 4)
+        self.assertTrue(all(first is second for first, second in results))
+
+        async def handle_async_request():
+            with inj.scope():
+                await asyncio.sleep(0)
+                return (await inj.aget(OrderService)).session, (await inj.aget(UserService)).session
+
+        async def handle_requests():
+            return await asyncio.gather(*(asyncio.ensure_future(handle_async_request()) for _ in range(4)))
+
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(handle_requests())
+        finally:
+            loop.close()
+        self.assertEqual(len({id(first) for first, _ in results}), 4)
+        self.assertTrue(all(first is second for first, second in results))
+
+    def test_released_with_injector(self):
+        defs = Definitions({'url': 'db://', Connection: Singleton(), Session: Scoped()})
+        inj = Injector(defs)
+        with inj.scope():
+            inj.get(Session)
+        inj_ref = ref(inj)
+        # The definitions keep the last injector
+        inj = Injector(defs)
+        with inj.scope():
+            inj.get(Session)
+        gc.collect()
+        self.assertIsNone(inj_ref())
+
+
+class Report:
+    builds = 0
+
+    def __init__(self, title='report'):
+        Report.builds += 1
+        self.title = title
+
+
+class Command:
+    report: Lazy[Report] = INJECTED
+
+    def __init__(self, palette: Lazy[Palette], verbose=False):
+        self.palette = palette
+
+
+class Parent:
+    def __init__(self, child: Lazy['Child']):
+        self.child = child
+
+
+class Child:
+    def __init__(self, parent: Parent):
+        self.parent = parent
+
+
+class TestLazy(TestCase):
+
+    def setUp(self):
+        Report.builds = 0
+
+    def test_created_on_first_use(self):
+        inj = Injector(Definitions({'color': 'red', Report: Instance(), Palette: Singleton(), Command: Instance()}))
+        command = inj.get(Command)
+        self.assertEqual(Report.builds, 0)
+        self.assertIs(type(command.report), Proxy)
+
+        self.assertEqual(command.report.title, 'report')
+        self.assertEqual(command.report.title, 'report')
+        self.assertEqual(Report.builds, 1)
+        self.assertIsInstance(command.report, Report)
+        self.assertEqual(command.palette.color, 'red')
+
+        # Each proxy creates its own instance
+        self.assertEqual(inj.get(Command).report.title, 'report')
+        self.assertEqual(Report.builds, 2)
+
+    def test_lazy_definition(self):
+        inj = Injector(Definitions({
+            Report: Lazy(Singleton()),
+            (Report, 'title'): 'lazy',
+            Palette: Lazy(Instance(), proxy=False),
+        }))
+        report = inj.get(Report)
+        self.assertEqual(Report.builds, 0)
+        self.assertEqual(report.title, 'lazy')
+        self.assertIs(resolve_proxy(inj.get(Report)), resolve_proxy(report))
+
+        provider = inj.get(Palette)
+        with self.assertRaises(MissingDependenciesError):
+            provider()
+
+    def test_plans(self):
+        inj = Injector(Definitions({'color': 'red', Report: Instance(), Palette: Instance(), Command: Instance()}))
+        for _ in range(10):
+            self.assertEqual(inj.get(Command, verbose=True).palette.color, 'red')
+        # One plan per creation path, not per proxy
+        self.assertLess(len(inj.plans.plans), 5)
+
+    def test_operators(self):
+        number = Proxy(lambda: 5)
+        self.assertEqual((number + 1, 1 + number, number * 2, -number, divmod(number, 2)), (6, 6, 10, -5, (2, 1)))
+        self.assertTrue(number == 5 and number < 6 and number >= 5)
+        self.assertEqual(hash(number), hash(5))
+        self.assertEqual(['a', 'b', 'c', 'd', 'e', 'f'][number], 'f')
+
+        items = Proxy(lambda: [1])
+        items += [2]
+        self.assertEqual(items, [1, 2])
+
+    def test_cycle(self):
+        inj = Injector(Definitions({Parent: Singleton(), Child: Instance()}))
+        parent = inj.get(Parent)
+        self.assertIsInstance(parent.child.parent, Parent)
+
+
+class Mailer:
+    builds = 0
+
+    def __init__(self):
+        Mailer.builds += 1
+
+
+class Customer:
+    mailer: Mailer = INJECTED
+    report: Report = INJECTED
+
+    def __init__(self, name):
+        self.name = name
+
+
+class Newsletter:
+    mailer: Mailer = INJECTED
+
+    def __init__(self):
+        self.sender = self.mailer
+
+
+class TestLazyAttributes(TestCase):
+
+    def setUp(self):
+        Mailer.builds = 0
+        Report.builds = 0
+
+    def get_injector(self, **kwargs):
+        return Injector(Definitions({Mailer: Singleton(), Report: Instance(), Customer: Instance()}), **kwargs)
+
+    def test_created_on_first_access(self):
+        for jit in (False, True):
+            self.setUp()
+            inj = self.get_injector(lazy_attributes=True, jit=jit)
+            customers = inj.get_many(Customer, [('a',), ('b',), ('c',)])
+            self.assertEqual((Mailer.builds, Report.builds), (0, 0))
+            self.assertNotIn('report', customers[0].__dict__)
+
+            report = customers[0].report
+            self.assertIsInstance(report, Report)
+            self.assertIs(customers[0].report, report)
+            self.assertEqual(Report.builds, 1)
+            self.assertIs(customers[1].mailer, customers[2].mailer)
+            self.assertEqual(customers[2].name, 'c')
+
+    def test_other_instances(self):
+        self.get_injector(lazy_attributes=True).get(Customer, 'lazy')
+
+        # The descriptors do not change the eager injection nor the classes created by hand
+        customer = self.get_injector().get(Customer, 'eager')
+        self.assertIn('report', customer.__dict__)
+        self.assertIsInstance(customer.report, Report)
+        self.assertIs(Customer('by hand').mailer, INJECTED)
+        self.assertEqual(len(collect_class_dependencies(Customer)), 3)
+
+    def test_used_by_init(self):
+        for jit in (False, True):
+            inj = Injector(Definitions({Mailer: Singleton(), Newsletter: Instance()}), lazy_attributes=True, jit=jit)
+            for _ in range(2):
+                newsletter = inj.get(Newsletter)
+                self.assertIsInstance(newsletter.sender, Mailer)
+
+    def test_pickle(self):
+        customer = self.get_injector(lazy_attributes=True).get(Customer, 'ann')
+        self.assertEqual(set(vars(customer)), {'name'})
+        restored = pickle.loads(pickle.dumps(customer))
+        self.assertEqual(restored.name, 'ann')
+        self.assertIsInstance(customer.mailer, Mailer)
+
+
+class TestWarmup(TestCase):
+
+    def setUp(self):
+        Index.builds = 0
+
+    def get_injector(self, *definitions):
+        return Injector(Definitions({
+            Index: Singleton(),
+            Search: Singleton(),
+            Ranking: Singleton(),
+            Brush: Instance(),
+            Engine: Instance(),
+        }, *definitions))
+
+    def test_singletons_in_dependency_order(self):
+        inj = self.get_injector()
+        report = inj.warmup([Engine])
+        self.assertTrue(report.ok)
+        paths = [step.path_text for step in report.steps]
+        self.assertEqual(paths, [':Engine -> search:Search -> index:Index', ':Engine -> search:Search',
+                                 ':Engine -> ranking:Ranking -> index:Index', ':Engine -> ranking:Ranking'])
+        self.assertGreater(report.steps[0].seconds, 0.04)
+        self.assertIn('Warmup report:', report.get())
+
+        # Nothing left to create
+        start = time.perf_counter()
+        inj.get(Engine)
+        self.assertLess(time.perf_counter() - start, 0.04)
+        self.assertEqual(inj.warmup([Engine]).steps, [])
+
+    def test_concurrent(self):
+        inj = self.get_injector()
+        with ThreadPoolExecutor(8) as executor:
+            report = inj.warmup(executor=executor)
+        self.assertTrue(report.ok)
+        self.assertEqual(len(report.steps), 9)
+        self.assertLess(report.seconds, 0.145)
+
+    def test_failures(self):
+        inj = self.get_injector({Ranking: CustomSingleton(BrokenRanking)})
+        report = inj.warmup()
+        self.assertEqual(len(report.failed), 2)
+        self.assertIn('failed [ValueError]', report.get())
+        self.assertIsInstance(inj.get(Search), Search)
+
+    def test_executor_shut_down(self):
+        class ClosingExecutor(ThreadPoolExecutor):
+            # Shut down once the first step is submitted
+            def submit(self, fn, *args, **kwargs):
+                future = super().submit(fn, *args, **kwargs)
+                self.shutdown(wait=False)
+                return future
+
+        inj = self.get_injector()
+        with ClosingExecutor(2) as executor:
+            report = inj.warmup([Engine], executor=executor)
+        self.assertEqual(len(report.steps), 4)
+        self.assertEqual(len(report.failed), 3)
+        self.assertIsInstance(report.failed[0].error, RuntimeError)
+
+
+class Pool:
+    pass
+
+
+class Templates:
+    def __init__(self, palette: Palette):
+        self.palette = palette
+
+
+class Gateway:
+    def __init__(self, pool: Pool, templates: Templates):
+        self.pool = pool
+        self.templates = templates
+
+
+class TestPrefork(TestCase):
+
+    def tearDown(self):
+        if hasattr(gc, 'unfreeze'):
+            gc.unfreeze()
+
+    def get_injector(self):
+        return Injector(Definitions({
+            'color': 'red',
+            Palette: Singleton(),
+            Templates: Singleton(),
+            Pool: Singleton(fork_safe=False),
+            Gateway: Singleton(),
+        }))
+
+    def test_fork_unsafe_singletons_are_left_out(self):
+        inj = self.get_injector()
+        report = inj.prefork([Gateway], register=False)
+        self.assertEqual([step.path_text for step in report.steps],
+                         [':Gateway -> templates:Templates -> palette:Palette', ':Gateway -> templates:Templates'])
+
+        gateway = inj.get(Gateway)
+        inj.after_fork()
+        other = inj.get(Gateway)
+        self.assertIsNot(other.pool, gateway.pool)
+        self.assertIsNot(other, gateway)
+        self.assertIs(other.templates, gateway.templates)
+
+    @skipUnless(hasattr(os, 'fork') and hasattr(os, 'register_at_fork'), 'fork')
+    def test_child_process(self):
+        inj = self.get_injector()
+        inj.prefork()
+        gateway = inj.get(Gateway)
+
+        read, write = os.pipe()
+        pid = os.fork()
+        if not pid:
+            other = inj.get(Gateway)
+            os.write(write, bytes([other.pool is not gateway.pool, other.templates is gateway.templates]))
+            os._exit(0)
+
+        os.close(write)
+        result = os.read(read, 2)
+        os.close(read)
+        os.waitpid(pid, 0)
+        self.assertEqual(result, bytes([True, True]))
+        self.assertIs(inj.get(Gateway), gateway)
+
+    @skipUnless(hasattr(os, 'fork') and hasattr(os, 'register_at_fork'), 'fork')
+    def test_registered_once(self):
+        calls = []
+
+        class CountingInjector(Injector):
+            def after_fork(self):
+                calls.append(self)
+                super().after_fork()
+
+        inj = CountingInjector(self.get_injector().dependencies[0])
+        inj.prefork()
+        inj.prefork()
+
+        read, write = os.pipe()
+        pid = os.fork()
+        if not pid:
+            os.write(write, bytes([len(calls)]))
+            os._exit(0)
+
+        os.close(write)
+        result = os.read(read, 1)
+        os.close(read)
+        os.waitpid(pid, 0)
+        self.assertEqual(result, bytes([1]))
+
+
+worker_definitions = Definitions({
+    'url': 'db://worker',
+    Connection: CustomSingleton(lambda url: Connection(url)),
+    Session: Instance(),
+})
+
+
+def get_worker_url(_):
+    return get_worker_injector().get(Session).connection.url
+
+
+class TestInjectorSpec(TestCase):
+
+    def test_pickle(self):
+        inj = Injector(worker_definitions, Autowiring(), jit=True)
+        inj.get(Session)
+        spec = pickle.loads(pickle.dumps(inj.get_spec()))
+        self.assertEqual(spec.locators[0], 'tests.test_injector:worker_definitions')
+        self.assertEqual(spec.shapes, [(Session, 0, ())])
+        self.assertTrue(spec.options['jit'])
+
+        other = Injector.from_spec(spec)
+        self.assertGreater(len(other.locator.cache), 0)
+        self.assertEqual(other.get(Session).connection.url, 'db://worker')
+
+    def test_local_definitions(self):
+        inj = Injector(Definitions({Connection: CustomSingleton(lambda: Connection('local'))}))
+        with self.assertRaises(WirinjError):
+            inj.get_spec()
+
+    @skipUnless(hasattr(os, 'fork'), 'fork')
+    def test_pool_initializer(self):
+        inj = Injector(worker_definitions)
+        with ProcessPoolExecutor(2, initializer=Injector.initializer, initargs=(inj.get_spec(),)) as pool:
+            self.assertEqual(list(pool.map(get_worker_url, range(3))), ['db://worker'] * 3)
+
+
+class RoutingTable:
+    builds = 0
+
+    def __init__(self, region, connection: Connection):
+        RoutingTable.builds += 1
+        self.routes = {region: connection.url}
+
+
+class RateLimiter:
+    def __init__(self):
+        self.lock = Lock()
+
+
+class TestPersistent(TestCase):
+
+    def get_injector(self, directory, region='eu', version=1):
+        return Injector(Definitions({
+            'region': region,
+            'url': 'db://routes',
+            Connection: Instance(),
+            RoutingTable: Persistent(version=version, directory=directory),
+        }))
+
+    def test_restore(self):
+        RoutingTable.builds = 0
+        with TemporaryDirectory() as directory:
+            table = self.get_injector(directory).get(RoutingTable)
+            self.assertEqual(table.routes, {'eu': 'db://routes'})
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+            inj = self.get_injector(directory)
+            restored = inj.get(RoutingTable)
+            self.assertEqual(RoutingTable.builds, 1)
+            self.assertEqual(restored.routes, table.routes)
+            self.assertIs(inj.get(RoutingTable), restored)
+
+    def test_key(self):
+        RoutingTable.builds = 0
+        with TemporaryDirectory() as directory:
+            self.get_injector(directory).get(RoutingTable)
+            self.assertEqual(self.get_injector(directory, region='us').get(RoutingTable).routes,
+                             {'us': 'db://routes'})
+            self.get_injector(directory, version=2).get(RoutingTable)
+            self.assertEqual(RoutingTable.builds, 3)
+
+            for name in os.listdir(directory):
+                with open(os.path.join(directory, name), 'wb') as f:
+                    f.write(b'corrupt')
+            with self.assertLogs('wirinj', 'WARNING'):
+                self.get_injector(directory).get(RoutingTable)
+            self.assertEqual(RoutingTable.builds, 4)
+
+    def test_not_picklable(self):
+        with TemporaryDirectory() as directory:
+            inj = Injector(Definitions({RateLimiter: Persistent(directory=directory)}))
+            with self.assertLogs('wirinj', 'WARNING'):
+                self.assertIsInstance(inj.get(RateLimiter), RateLimiter)
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_key_not_picklable(self):
+        region = Lock()
+        with TemporaryDirectory() as directory:
+            inj = self.get_injector(directory, region=region)
+            with self.assertLogs('wirinj', 'WARNING'):
+                table = inj.get(RoutingTable)
+            self.assertEqual(table.routes, {region: 'db://routes'})
+            self.assertEqual(os.listdir(directory), [])
+
+
+class Embeddings:
+    vectors = INJECTED
+
+
+class TestMappedFile(TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'vectors.bin')
+        with open(self.path, 'wb') as f:
+            f.write(bytes(range(16)))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def get_injector(self, **kwargs):
+        return Injector(Definitions({'vectors': MappedFile(self.path, **kwargs), Embeddings: Instance()}))
+
+    def test_mapping(self):
+        with self.get_injector(offset=4) as inj:
+            vectors = inj.get(Embeddings).vectors
+            self.assertIs(inj.get(Embeddings).vectors, vectors)
+            self.assertEqual(bytes(vectors[:2]), b'\x04\x05')
+            self.assertEqual(len(vectors), 12)
+        if isinstance(vectors, memoryview):
+            with self.assertRaises(ValueError):
+                vectors[0]
+
+        # Mapped again once closed
+        self.assertEqual(inj.get(Embeddings).vectors[0], 4)
+        inj.close()
+
+    def test_writable(self):
+        inj = self.get_injector(writable=True)
+        inj.get(Embeddings).vectors[0] = 255
+        inj.close()
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(1), b'\xff')
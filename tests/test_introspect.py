@@ -0,0 +1,50 @@
+from unittest import TestCase
+
+from wirinj import INJECTED
+from wirinj.introspect import get_class_dependencies, get_introspection_stats, invalidate_introspection, \
+    get_func_args
+
+
+class Engine:
+    pass
+
+
+class Vehicle:
+    engine: Engine = INJECTED
+
+    def __init__(self, name):
+        self.name = name
+
+
+class Car(Vehicle):
+    pass
+
+
+def build(engine: Engine, name='car'):
+    pass
+
+
+class TestIntrospectionCache(TestCase):
+
+    def tearDown(self):
+        if hasattr(Vehicle, 'wheels'):
+            del Vehicle.wheels
+        invalidate_introspection(Vehicle)
+
+    def test_results_are_memoized(self):
+        first = get_class_dependencies(Car)
+        hits = get_introspection_stats()['hits']
+        self.assertIs(get_class_dependencies(Car), first)
+        self.assertEqual(get_introspection_stats()['hits'], hits + 1)
+        self.assertEqual([arg.name for arg in first], ['name', 'engine'])
+        self.assertIs(get_func_args(build), get_func_args(build))
+
+    def test_invalidation_reaches_subclasses(self):
+        self.assertEqual(len(get_class_dependencies(Car)), 2)
+
+        # Hot reload of the base class
+        Vehicle.wheels = INJECTED
+        self.assertEqual(len(get_class_dependencies(Car)), 2)
+
+        invalidate_introspection(Vehicle)
+        self.assertEqual([arg.name for arg in get_class_dependencies(Car)], ['name', 'engine', 'wheels'])
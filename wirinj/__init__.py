@@ -2,8 +2,15 @@ from .core import logger, Arg, Dependency, Locator, INJECTED
 from .autowiring import AutowiringReport, Autowiring
 from .decorators import deps, inject
 from .definition import Definitions, DependencyBuilder, Singleton, Factory, Instance, CustomSingleton, CustomInstance,\
-    CustomFactory
+    CustomFactory, BackgroundSingleton, Scoped, Lazy, Persistent, MappedFile
+from .imports import ImportRef, get_import_report
 from .injector import Injector
+from .introspect import invalidate_introspection, get_introspection_stats, use_metadata_cache
 from .locators import Locator, LocatorCache, LocatorChain
+from .metadata import MetadataCache
+from .patterns import ANY, ANCESTORS, SubclassOf
+from .proxy import Proxy, resolve_proxy
+from .scope import Scope
+from .spec import InjectorSpec, get_worker_injector
 
 __all__ = [x for x in dir() if not x.startswith('_')]
@@ -67,6 +67,10 @@ class Autowiring(Locator):
     def initialize(self, injector):
         self.injector = injector
 
+    def __getstate__(self):
+        # The injector and the created singletons stay in this process
+        return {'report': self.report, 'singletons': {}, 'use_singletons': self.use_singletons}
+
     def get(self, creation_path: Sequence[Arg]) -> Optional[Dependency]:
         arg = creation_path[-1]
 
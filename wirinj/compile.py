@@ -0,0 +1,348 @@
+import argparse
+import sys
+from typing import Sequence, List, Any, Iterable
+
+from .core import Arg, NotSet, Locator, INJECTED
+from .dependencies import ValueDependency, InstanceDependency, SingletonWrapper, FactoryDependency, \
+    CustomInstanceDependency
+from .errors import CompileError
+from .imports import import_by_path
+from .injector import Injector, NotFound, DefaultDependency, CreationNode
+from .introspect import get_attribute_deps, get_signature_deps, has_init_injection
+
+HEADER = '''"""
+Wiring generated by wirinj.compile from {source}.
+Do not edit it. Run `python -m wirinj.compile {source} -o <this file>` again instead.
+"""
+'''
+
+RUNTIME = '''
+_NOT_SET = object()
+
+_NO_KWARGS = {}
+
+_singletons = {}
+
+
+def _missing(path):
+    raise MissingDependenciesError('Missing dependency: ' + path)
+
+
+def _direct(args, kwargs, index, name, default):
+    # The argument is given by the caller, so it is not injected
+    return index < len(args) or name in kwargs and kwargs[name] != default
+
+
+def _instantiate(cls, args, kwargs, deps, private, init_injection):
+    priv_deps = {}
+    pub_deps = {}
+    for name, value in deps.items():
+        if name in private:
+            priv_deps[name] = value
+        else:
+            pub_deps[name] = value
+
+    if not priv_deps:
+        return cls(*args, **{**pub_deps, **kwargs})
+
+    if init_injection:
+        return cls(*args, **{'_dependencies': priv_deps, **pub_deps, **kwargs})
+
+    # Private dependencies are set before running __init__
+    kwargs = {**pub_deps, **kwargs}
+    new = cls.__new__
+    instance = object.__new__(cls) if new is object.__new__ else new(cls, *args, **kwargs)
+    for name, value in priv_deps.items():
+        setattr(instance, name, value)
+    instance.__init__(*args, **kwargs)
+    return instance
+'''
+
+FOOTER = '''
+
+def get(cls, *args, **kwargs):
+    try:
+        root = _roots[cls]
+    except KeyError:
+        raise MissingDependenciesError('{} is not wired in this module.'.format(cls)) from None
+    return root(args, kwargs)
+'''
+
+LITERAL_TYPES = (type(None), bool, int, float, complex, str, bytes)
+
+
+def path_as_text(path: Sequence[Arg]) -> str:
+    return ' -> '.join(str(entry) for entry in path)
+
+
+def get_definition_roots(locator: Locator) -> List[Any]:
+    """
+    Classes defined as single element keys, which are the ones that can be requested through `get`.
+    """
+    return list(locator.get_roots())
+
+
+class WiringCompiler:
+    """
+    Walks the dependency graph located by an injector and writes it as a plain Python module.
+    Nothing is instantiated while compiling.
+    """
+
+    def __init__(self, injector: Injector, source: str):
+        self.injector = injector
+        self.source = source
+        self.located = {}
+        self.modules = set()
+        self.imports = set()
+        self.constants = []
+        self.constant_names = {}
+        self.constant_values = []
+        self.functions = []
+        self.singleton_names = {}
+        self.roots = {}
+        self.pending_roots = []
+        self.counter = 0
+
+    def compile(self, roots: Iterable[Any]) -> str:
+        for cls in roots:
+            self.add_root(cls)
+
+        while self.pending_roots:
+            cls = self.pending_roots.pop(0)
+            _, node = self.injector._locate_node((), Arg(None, cls), None, self.located)
+            self.roots[cls] = self.gen_function(node, True)
+
+        return self.render()
+
+    def add_root(self, cls):
+        if cls not in self.roots and cls not in self.pending_roots:
+            self.pending_roots.append(cls)
+
+    def render(self) -> str:
+        lines = [HEADER.format(source=self.source)]
+
+        lines.append('from wirinj.errors import MissingDependenciesError')
+        for line in sorted(self.imports):
+            lines.append(line)
+        if self.modules:
+            lines.append('')
+        for module in sorted(self.modules):
+            lines.append('import {}'.format(module))
+
+        lines.append(RUNTIME)
+        for constant in self.constants:
+            lines.append(constant)
+
+        for function in self.functions:
+            lines.append('\n')
+            lines.append(function)
+
+        lines.append('\n')
+        lines.append('_roots = {')
+        for cls, name in self.roots.items():
+            lines.append('    {}: {},'.format(self.reference(cls), name))
+        lines.append('}')
+        lines.append(FOOTER)
+
+        return '\n'.join(lines)
+
+    def new_name(self, prefix: str) -> str:
+        self.counter += 1
+        return '{}{}'.format(prefix, self.counter)
+
+    def gen_expr(self, node: CreationNode) -> str:
+        dep = node.dep
+
+        if dep is NotFound:
+            return '_missing({!r})'.format(path_as_text(node.path))
+        if isinstance(dep, ValueDependency):
+            return self.constant(dep.value)
+        if isinstance(dep, DefaultDependency):
+            return self.constant(dep.default)
+
+        return '{}()'.format(self.gen_function(node, False))
+
+    def gen_function(self, node: CreationNode, root: bool) -> str:
+        """
+        @return: The name of a function `(args, kwargs)` that creates the node.
+        """
+        dep = node.dep
+
+        if dep is NotFound or isinstance(dep, ValueDependency) or isinstance(dep, DefaultDependency):
+            name = self.new_name('_n')
+            self.functions.append('def {}(args=(), kwargs=_NO_KWARGS):\n    return {}'.format(
+                name, self.gen_expr(node)))
+            return name
+
+        if isinstance(dep, SingletonWrapper):
+            name = self.singleton_names.get(id(dep))
+            if name is not None:
+                return name
+
+            if dep.instance is not None:
+                raise CompileError('Singleton already created at {}'.format(path_as_text(node.path)))
+
+            name = self.singleton_names[id(dep)] = self.new_name('_s')
+            body = ['try:', '    return _singletons[{!r}]'.format(name), 'except KeyError:', '    pass']
+            body += self.gen_deps(node, root)
+            body.append('instance = _singletons[{!r}] = {}'.format(name, self.gen_instance(dep.dependency, node)))
+            body.append('return instance')
+
+        else:
+            name = self.new_name('_n')
+            body = self.gen_deps(node, root)
+            body.append('return {}'.format(self.gen_instance(dep, node)))
+
+        self.functions.append('def {}(args=(), kwargs=_NO_KWARGS):\n    # {}\n{}'.format(
+            name,
+            path_as_text(node.path),
+            '\n'.join('    ' + line for line in body),
+        ))
+        return name
+
+    def gen_deps(self, node: CreationNode, root: bool) -> List[str]:
+        lines = ['deps = {}']
+        for i, child in enumerate(node.childs):
+            assign = 'deps[{!r}] = {}'.format(child.arg.name, self.gen_expr(child))
+
+            # Only the root receives arguments from the caller, which take the place of the injected ones
+            if root:
+                default = '_NOT_SET' if child.arg.default is NotSet else self.constant(child.arg.default)
+                lines.append('if not _direct(args, kwargs, {}, {!r}, {}):'.format(i, child.arg.name, default))
+                assign = '    ' + assign
+            lines.append(assign)
+        return lines
+
+    def gen_instance(self, dep, node: CreationNode) -> str:
+        if dep.is_async():
+            raise CompileError('{} is created by a coroutine function, found at {}'.format(
+                dep.__class__.__name__, path_as_text(node.path)))
+
+        if isinstance(dep, InstanceDependency):
+            cls = dep.cls
+            private = tuple(arg.name for arg in list(get_attribute_deps(cls)) + list(get_signature_deps(cls)))
+            return '_instantiate({}, args, kwargs, deps, {!r}, {})'.format(
+                self.reference(cls), private, has_init_injection(cls) and bool(private))
+
+        if isinstance(dep, CustomInstanceDependency):
+            return '{}(*args, **{{**deps, **kwargs}})'.format(self.reference(dep.func))
+
+        if isinstance(dep, FactoryDependency):
+            self.add_root(dep.cls)
+            factory = 'get_subclassing_factory' if dep.kind == 'subclass' else 'get_func_factory'
+            self.imports.add('from wirinj.tools import {}'.format(factory))
+            return '{}({}, get)'.format(factory, self.reference(dep.cls))
+
+        if isinstance(dep, ValueDependency):
+            return self.constant(dep.value)
+
+        raise CompileError('Cannot compile {} found at {}'.format(dep.__class__.__name__, path_as_text(node.path)))
+
+    def constant(self, value) -> str:
+        """
+        Other than literals, values are module level constants so every injection shares the same object, as the
+        injector does.
+        """
+        if isinstance(value, LITERAL_TYPES) or value is INJECTED:
+            return self.source_of(value)
+
+        name = self.constant_names.get(id(value))
+        if name is None:
+            name = self.constant_names[id(value)] = self.new_name('_v')
+            self.constants.append('{} = {}'.format(name, self.source_of(value)))
+            # Keep the value alive so its id is not reused
+            self.constant_values.append(value)
+        return name
+
+    def source_of(self, value) -> str:
+        if isinstance(value, LITERAL_TYPES):
+            return repr(value)
+        if value is INJECTED:
+            self.imports.add('from wirinj.core import INJECTED')
+            return 'INJECTED'
+        if isinstance(value, list):
+            return '[{}]'.format(', '.join(self.source_of(item) for item in value))
+        if isinstance(value, tuple):
+            return '({}{})'.format(', '.join(self.source_of(item) for item in value), ',' if len(value) == 1 else '')
+        if isinstance(value, dict):
+            return '{{{}}}'.format(', '.join(
+                '{}: {}'.format(self.source_of(key), self.source_of(item)) for key, item in value.items()))
+        if isinstance(value, (set, frozenset)) and value:
+            items = '{{{}}}'.format(', '.join(self.source_of(item) for item in value))
+            return items if isinstance(value, set) else 'frozenset({})'.format(items)
+        return self.reference(value)
+
+    def reference(self, obj) -> str:
+        module = getattr(obj, '__module__', None)
+        qualname = getattr(obj, '__qualname__', None)
+        if module and qualname and '<' not in qualname:
+            try:
+                found = import_by_path('{}:{}'.format(module, qualname))
+            except (ImportError, AttributeError):
+                found = None
+            if found is obj:
+                self.modules.add(module)
+                return '{}.{}'.format(module, qualname)
+
+        raise CompileError('{!r} cannot be referenced from the generated module'.format(obj))
+
+
+def get_injector(target) -> Injector:
+    if isinstance(target, Injector):
+        return Injector(target.locator)
+    if isinstance(target, Locator):
+        return Injector(target)
+    if isinstance(target, (list, tuple)):
+        return Injector(*target)
+    raise CompileError('{!r} is not an Injector, a Locator or a list of Locators'.format(target))
+
+
+def compile_wiring(source: str, roots: Sequence[Any] = ()) -> str:
+    """
+    @param source: import path of an Injector, a Locator such as Definitions or a list of them, e.g. 'pkg.defs:defs'.
+    @param roots: classes to wire. By default, the classes defined as single element keys in the Definitions.
+    @return: The source of the generated module.
+    """
+    injector = get_injector(import_by_path(source))
+    roots = list(roots) + get_definition_roots(injector.locator)
+    return WiringCompiler(injector, source).compile(roots)
+
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m wirinj.compile',
+        description='Generate a plain Python module wiring the dependencies, with no introspection at run time.',
+    )
+    parser.add_argument('source', help='import path of the definitions, e.g. mypkg.defs:definitions')
+    parser.add_argument('-o', '--output', help='generated module path, stdout by default')
+    parser.add_argument('-r', '--root', action='append', default=[],
+                        help='import path of a class to wire in addition to the definition keys')
+    parser.add_argument('--check', action='store_true',
+                        help='do not write anything, exit with status 1 if the output is out of date')
+    options = parser.parse_args(argv)
+
+    code = compile_wiring(options.source, [import_by_path(root) for root in options.root])
+
+    if options.check:
+        if not options.output:
+            parser.error('--check requires --output')
+        try:
+            with open(options.output) as f:
+                current = f.read()
+        except FileNotFoundError:
+            current = None
+        if current != code:
+            print('{} is out of date with {}'.format(options.output, options.source), file=sys.stderr)
+            return 1
+        return 0
+
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(code)
+    else:
+        sys.stdout.write(code)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
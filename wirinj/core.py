@@ -1,6 +1,6 @@
 from abc import abstractmethod, ABCMeta
 from logging import getLogger
-from typing import Optional, Union, Sequence, Any, TypeVar
+from typing import Optional, Union, Sequence, Any, TypeVar, Callable
 
 import wirinj
 from .tools import get_cls_name
@@ -77,6 +77,56 @@ class Dependency(metaclass=ABCMeta):
     def get_instance(self, instance_args: FunctionArgs = None, **deps):
         pass
 
+    async def aget_instance(self, instance_args: FunctionArgs = None, **deps):
+        """
+        Asynchronous version of `get_instance`, used by `Injector.aget`.
+        """
+        return self.get_instance(instance_args, **deps)
+
+    def is_async(self) -> bool:
+        """
+        True if the instance can only be created through `aget_instance`.
+        """
+        return False
+
+    def reset(self):
+        """
+        Forget any instance kept by the dependency, so it is created again next time.
+        """
+        pass
+
+    def is_singleton(self) -> bool:
+        """
+        True if the dependency creates its instance once and then returns it every time.
+        """
+        return False
+
+    def get_constant(self) -> Union[Any, NotSetType]:
+        """
+        The instance if it is already known and will not change, e.g. a value or a created singleton.
+        NotSet otherwise.
+        """
+        return NotSet
+
+    def get_constructor(self) -> Optional[Callable]:
+        """
+        A callable equivalent to `get_instance` that takes the instance args and the dependencies as plain
+        arguments: `constructor(*args, **{**deps, **kwargs})`. None if there is no such callable.
+        """
+        return None
+
+    def is_fork_safe(self) -> bool:
+        """
+        False if the instance cannot be used by a forked child process, e.g. a connection or a thread pool.
+        """
+        return True
+
+    def get_attribute_dependencies(self) -> Sequence[Arg]:
+        """
+        Dependencies set as attributes of the instance, which `get_instance` can do without.
+        """
+        return ()
+
 
 class Locator(metaclass=ABCMeta):
 
@@ -87,6 +137,18 @@ class Locator(metaclass=ABCMeta):
     def get(self, creation_path: Sequence[Arg]) -> Optional[Dependency]:
         pass
 
+    def override(self, key, value) -> bool:
+        """
+        Add or replace a definition. Returns False if the locator does not support definitions.
+        """
+        return False
+
+    def get_roots(self) -> Sequence[Any]:
+        """
+        Classes that can be requested directly through `get`, as far as the locator knows them.
+        """
+        return ()
+
 
 def filter_direct_args(arg_list: Sequence[Arg], args, kwargs):
     result = []
@@ -60,10 +60,6 @@ def inject(*dependencies: Locator,
                              .format(inject.__name__, Injector.__name__, Locator.__name__))
 
     def get_func_wrapper(func):
-
-        def func_wrapper(*args, **kwargs):
-            return inj.call(func, *args, **kwargs)
-
-        return func_wrapper
+        return inj.get_wrapper(func)
 
     return get_func_wrapper
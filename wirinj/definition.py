@@ -1,11 +1,139 @@
+import os
 from abc import abstractmethod
-from typing import List, Callable, Optional, Dict
+from typing import List, Callable, Optional, Dict, Sequence, Iterable, Any
+from weakref import WeakSet
 
 from .core import Arg, NotSet, Locator, Dependency
 from .dependencies import FactoryDependency, InstanceDependency, SingletonWrapper, ValueDependency, \
-    CustomInstanceDependency
-from .injector import Injector
-from .tools import is_typing_type, get_typing_args
+    CustomInstanceDependency, BackgroundSingletonWrapper, ScopedDependency, PersistentDependency, \
+    MappedFileDependency
+from .imports import ImportRef, as_import_ref, resolve_import_ref, get_cls_path
+from .injector import Injector, LazyDependency
+from .patterns import ANCESTORS, PatternAutomaton, is_pattern
+from .tools import is_typing_type, get_typing_args, LazyType
+
+
+class DefinitionEntry:
+    def __init__(self, key, value, order: int):
+        self.key = key
+        self.value = value
+        self.order = order
+        definition = key if isinstance(key, list) or isinstance(key, tuple) else (key,)
+        self.definition = tuple(as_import_ref(item) for item in definition)
+
+        # Gaps do not make a definition more specific
+        self.rank = len([item for item in self.definition if item is not ANCESTORS])
+
+    def beats(self, other: 'DefinitionEntry') -> bool:
+        """
+        The more specific definition wins. On equal specificity, the first definition wins.
+        """
+        return self.rank > other.rank or self.rank == other.rank and self.order < other.order
+
+    def matches(self, creation_path: Sequence[Arg]) -> bool:
+        return PatternAutomaton((self,)).find(creation_path) is self
+
+
+class DefinitionIndexNode:
+    def __init__(self):
+        self.childs = {}
+        self.ref_childs = {}
+        self.refs = {}  # type: Dict[str, ImportRef]
+        self.entries = []  # type: List[DefinitionEntry]
+        self.entry = None  # type: Optional[DefinitionEntry]
+
+    def update_entry(self):
+        self.entry = None
+        for entry in self.entries:
+            if self.entry is None or entry.beats(self.entry):
+                self.entry = entry
+
+
+class DefinitionIndex:
+    """
+    Suffix trie of the definition keys.
+    Every key is inserted from its last element backwards, so a creation path is matched walking it from its end.
+    The lookup time depends on the depth of the creation path, not on the number of definitions.
+    """
+
+    def __init__(self, entries: Iterable[DefinitionEntry] = ()):
+        self.root = DefinitionIndexNode()
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry: DefinitionEntry):
+        node = self._get_node(entry)
+        node.entries.append(entry)
+        node.update_entry()
+
+    def remove(self, entry: DefinitionEntry):
+        node = self._get_node(entry)
+        node.entries.remove(entry)
+        node.update_entry()
+
+    def _get_node(self, entry: DefinitionEntry) -> DefinitionIndexNode:
+        node = self.root
+        for def_item in reversed(entry.definition):
+            # Classes referenced by import path are indexed by their path so they never need to be imported
+            if isinstance(def_item, ImportRef):
+                childs, child_key = node.ref_childs, def_item.dotted
+                node.refs[child_key] = def_item
+            else:
+                childs, child_key = node.childs, def_item
+
+            child = childs.get(child_key)
+            if child is None:
+                child = childs[child_key] = DefinitionIndexNode()
+            node = child
+        return node
+
+    def find(self, creation_path: Sequence[Arg]) -> Optional[DefinitionEntry]:
+        result = None
+        nodes = [self.root]
+
+        for path_item in reversed(creation_path):
+            next_nodes = []
+            for node in nodes:
+                childs = node.childs
+
+                # A string matches the argument name, anything else the argument type annotation
+                by_name = childs.get(path_item.name) if childs and isinstance(path_item.name, str) else None
+                by_cls = childs.get(path_item.cls) if childs else None
+                by_ref = self._find_ref_child(node, path_item.cls) if node.ref_childs else None
+
+                for child in (by_name, by_cls, by_ref):
+                    if child is None or child in next_nodes:
+                        continue
+                    next_nodes.append(child)
+
+            if not next_nodes:
+                break
+
+            # Longest match wins, so any entry at this depth beats the shorter ones
+            depth_result = None
+            for node in next_nodes:
+                if node.entry is not None and (depth_result is None or node.entry.beats(depth_result)):
+                    depth_result = node.entry
+            if depth_result is not None:
+                result = depth_result
+
+            nodes = next_nodes
+
+        return result
+
+    @staticmethod
+    def _find_ref_child(node: DefinitionIndexNode, cls) -> Optional[DefinitionIndexNode]:
+        if isinstance(cls, str):
+            return node.ref_childs.get(cls)
+        if not isinstance(cls, type):
+            return None
+        child = node.ref_childs.get(get_cls_path(cls))
+        if child is None:
+            # Re-exported names
+            for dotted, ref in node.refs.items():
+                if ref.matches(cls):
+                    return node.ref_childs[dotted]
+        return child
 
 
 class DefinitionFinder:
@@ -13,33 +141,60 @@ class DefinitionFinder:
         assert isinstance(definitions, dict)
         self.definitions = definitions
 
-    def __call__(self, creation_path: List[Arg]):
+        self.entries = {}
+        for order, (key, value) in enumerate(definitions.items()):
+            self.entries[key] = DefinitionEntry(key, value, order)
+        self.next_order = len(self.entries)
+
+        self.index = DefinitionIndex(entry for entry in self.entries.values() if not is_pattern(entry.definition))
+        self.patterns = None  # type: Optional[PatternAutomaton]
+        self._compile_patterns()
+
+    def add(self, key, value) -> DefinitionEntry:
+        """
+        Add a definition. A replaced definition keeps its precedence, a new one goes after the existing ones.
+        """
+        old_entry = self.entries.get(key)
+        if old_entry is None:
+            entry = DefinitionEntry(key, value, self.next_order)
+            self.next_order += 1
+        else:
+            self._remove_entry(old_entry)
+            entry = DefinitionEntry(key, value, old_entry.order)
 
-        result_key = None
-        result_value = None
-        def_len = 0
+        self.definitions[key] = value
+        self.entries[key] = entry
+        if is_pattern(entry.definition):
+            self._compile_patterns()
+        else:
+            self.index.add(entry)
+        return entry
 
-        for key, value in self.definitions.items():
-            definition = key if isinstance(key, list) or isinstance(key, tuple) else (key,)
+    def remove(self, key) -> DefinitionEntry:
+        entry = self.entries.pop(key)
+        del self.definitions[key]
+        self._remove_entry(entry)
+        if is_pattern(entry.definition):
+            self._compile_patterns()
+        return entry
 
-            if len(definition) > len(creation_path):
-                continue
+    def _remove_entry(self, entry: DefinitionEntry):
+        if not is_pattern(entry.definition):
+            self.index.remove(entry)
 
-            if len(definition) <= def_len:
-                continue
+    def _compile_patterns(self):
+        patterns = [entry for entry in self.entries.values() if is_pattern(entry.definition)]
+        self.patterns = PatternAutomaton(patterns) if patterns else None
+
+    def __call__(self, creation_path: Sequence[Arg]):
+        entry = self.index.find(creation_path)
 
-            match = True
-            for i, def_item in enumerate(reversed(definition)):
-                path_item = creation_path[-i - 1]
-                if not (isinstance(def_item, str) and def_item == path_item.name or def_item == path_item.cls):
-                    match = False
-                    break
-            if match:
-                result_key = key
-                result_value = value
-                def_len = len(definition)
+        if self.patterns is not None:
+            pattern_entry = self.patterns.find(creation_path)
+            if pattern_entry is not None and (entry is None or pattern_entry.beats(entry)):
+                entry = pattern_entry
 
-        return (NotSet, NotSet) if def_len == 0 else (result_key, result_value)
+        return (NotSet, NotSet) if entry is None else (entry.key, entry.value)
 
 
 class DependencyBuilder:
@@ -63,20 +218,26 @@ class CustomInstance(DependencyBuilder):
 
 
 class CustomSingleton(DependencyBuilder):
-    def __init__(self, creator: Callable, cls=None):
+    def __init__(self, creator: Callable, cls=None, fork_safe=True):
+        """
+        @param fork_safe: False if the instance must be created again in forked child processes, see
+        `Injector.after_fork`.
+        """
         self.creator = creator
         self.cls = cls
+        self.fork_safe = fork_safe
 
     def create(self, creation_path: List[Arg], injector: Injector):
-        return SingletonWrapper(CustomInstanceDependency(self.creator, self.cls))
+        return SingletonWrapper(CustomInstanceDependency(self.creator, self.cls), self.fork_safe)
 
 
 CustomFactory = CustomSingleton
 
 
 class Factory(DependencyBuilder):
-    def __init__(self, cls=None):
-        self.cls = cls
+    def __init__(self, cls=None, kind: Optional[str] = None):
+        self.cls = as_import_ref(cls)
+        self.kind = kind
 
     def create(self, creation_path: List[Arg], injector: Injector):
         if self.cls is None:
@@ -85,14 +246,14 @@ class Factory(DependencyBuilder):
                 'Factory without params needs Type[YourClass] as last element in the definition path'
             cls = get_typing_args(last.cls)
         else:
-            cls = self.cls
+            cls = resolve_import_ref(self.cls)
 
-        return SingletonWrapper(FactoryDependency(cls, injector))
+        return SingletonWrapper(FactoryDependency(cls, injector, self.kind))
 
 
 class Instance(DependencyBuilder):
     def __init__(self, cls=None):
-        self.cls = cls
+        self.cls = as_import_ref(cls)
 
     def create(self, creation_path: List[Arg], injector: Injector):
         if self.cls is None:
@@ -101,14 +262,19 @@ class Instance(DependencyBuilder):
                 'Instance without params needs YourClass as last element in the definition path'
             cls = last.cls
         else:
-            cls = self.cls
+            cls = resolve_import_ref(self.cls)
 
         return InstanceDependency(cls)
 
 
 class Singleton(DependencyBuilder):
-    def __init__(self, cls=None):
-        self.cls = cls
+    def __init__(self, cls=None, fork_safe=True):
+        """
+        @param fork_safe: False if the instance must be created again in forked child processes, see
+        `Injector.after_fork`.
+        """
+        self.cls = as_import_ref(cls)
+        self.fork_safe = fork_safe
 
     def create(self, creation_path: List[Arg], injector: Injector):
         if self.cls is None:
@@ -117,9 +283,160 @@ class Singleton(DependencyBuilder):
                 'Singleton without params needs YourClass as last element in the definition path'
             cls = last.cls
         else:
-            cls = self.cls
+            cls = resolve_import_ref(self.cls)
+
+        return SingletonWrapper(InstanceDependency(cls), self.fork_safe)
+
+
+DEFAULT_PERSISTENT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'wirinj')
+
+
+class Persistent(DependencyBuilder):
+    """
+    Singleton pickled to `directory` once created. Later processes restore it from there unless the class, the values
+    it gets from the definitions or `version` change. Only for objects that are pure data, and for a directory only
+    trusted processes can write to, since the files are unpickled.
+    """
+
+    def __init__(self, cls=None, version=None, directory: Optional[str] = None):
+        self.cls = as_import_ref(cls)
+        self.version = version
+        self.directory = directory or DEFAULT_PERSISTENT_DIRECTORY
 
-        return SingletonWrapper(InstanceDependency(cls))
+    def create(self, creation_path: List[Arg], injector: Injector):
+        if self.cls is None:
+            last = creation_path[-1]
+            assert isinstance(last.cls, type), \
+                'Persistent without params needs YourClass as last element in the definition path'
+            cls = last.cls
+        else:
+            cls = resolve_import_ref(self.cls)
+
+        return SingletonWrapper(PersistentDependency(InstanceDependency(cls), injector, cls, self.directory,
+                                                     self.version))
+
+
+class MappedFile(DependencyBuilder):
+    """
+    Large binary file, such as an embedding matrix, mapped into memory instead of read, so the processes that use it
+    share one copy through the page cache. Injected as a `numpy.memmap` of `dtype` and `shape` when NumPy is installed,
+    or as a `memoryview` otherwise. The file is mapped on first use, once per injector, and closed by
+    `Injector.close()`.
+    """
+
+    def __init__(self, path: str, writable=False, dtype=None, shape=None, offset=0):
+        """
+        @param path: path of the file.
+        @param writable: if True, changes are written to the file.
+        @param dtype: NumPy data type, bytes by default.
+        @param shape: NumPy shape, by default a one dimensional array up to the end of the file.
+        @param offset: position in the file where the mapped data starts.
+        """
+        self.path = path
+        self.writable = writable
+        self.dtype = dtype
+        self.shape = shape
+        self.offset = offset
+
+    def create(self, creation_path: List[Arg], injector: Injector):
+        # A single mapping per injector, whatever the creation path
+        dep = injector.shared_dependencies.get((self, None))
+        if dep is None:
+            dep = injector.shared_dependencies[self, None] = MappedFileDependency(self.path, self.writable, self.dtype,
+                                                                                  self.shape, self.offset)
+            injector.mapped_files.append(dep)
+        return dep
+
+
+class Scoped(DependencyBuilder):
+    """
+    Instance created once per `Injector.scope()`, e.g. a database session per request.
+    """
+
+    def __init__(self, cls=None):
+        self.cls = as_import_ref(cls)
+
+    def create(self, creation_path: List[Arg], injector: Injector):
+        if self.cls is None:
+            last = creation_path[-1]
+            assert isinstance(last.cls, type), \
+                'Scoped without params needs YourClass as last element in the definition path'
+            cls = last.cls
+        else:
+            cls = resolve_import_ref(self.cls)
+
+        # The same instance in a scope, whatever the creation path
+        dep = injector.shared_dependencies.get((self, cls))
+        if dep is None:
+            dep = injector.shared_dependencies[self, cls] = ScopedDependency(InstanceDependency(cls), injector, cls)
+        return dep
+
+
+class BackgroundSingleton(DependencyBuilder):
+    """
+    Singleton created on a worker thread when the injector is created, or the executor of the injector if it has
+    one. The consumers get a proxy that waits for the object on first use or, with `proxy=False`, a
+    `concurrent.futures.Future` of it.
+    There is a single instance per injector, whatever the creation path.
+    """
+
+    def __init__(self, cls=None, proxy=True):
+        self.cls = as_import_ref(cls)
+        self.proxy = proxy
+
+    def get_dependency(self, cls, injector: Injector) -> BackgroundSingletonWrapper:
+        dep = injector.shared_dependencies.get((self, None))
+        if dep is None:
+            if self.cls is not None:
+                cls = resolve_import_ref(self.cls)
+            assert isinstance(cls, type), \
+                'BackgroundSingleton without params needs YourClass as last element in the definition path'
+
+            dep = injector.shared_dependencies[self, None] = BackgroundSingletonWrapper(InstanceDependency(cls),
+                                                                                        injector, cls, self.proxy)
+            injector.background_singletons.append(dep)
+        return dep
+
+    def create(self, creation_path: List[Arg], injector: Injector):
+        dep = self.get_dependency(creation_path[-1].cls, injector)
+        # Not started yet if the definition was added after the injector was created
+        dep.start()
+        return dep
+
+
+class LazyMeta(type):
+    def __getitem__(cls, item) -> LazyType:
+        return LazyType(as_import_ref(item))
+
+
+class Lazy(DependencyBuilder, metaclass=LazyMeta):
+    """
+    Wraps a definition so a proxy, which creates the dependency on first use, is injected instead.
+    With `proxy=False`, a function that creates the dependency on its first call is injected.
+    `Lazy[T]` is the annotation of an argument that gets a proxy of the dependency `T`.
+    """
+
+    def __init__(self, definition, proxy=True):
+        self.definition = definition
+        self.proxy = proxy
+
+    def create(self, creation_path: List[Arg], injector: Injector):
+        dependency = as_dependency(self.definition, creation_path, injector)
+        return LazyDependency(injector, creation_path[:-1], creation_path[-1], dependency, self.proxy)
+
+
+def as_dependency(value, creation_path: List[Arg], injector: Injector) -> Dependency:
+    """
+    @param value: definition value.
+    """
+    if isinstance(value, Dependency):
+        return value
+    if isinstance(value, DependencyBuilder):
+        return value.create(creation_path, injector)
+    if isinstance(value, ImportRef):
+        return ValueDependency(value.resolve())
+    else:
+        return ValueDependency(value)
 
 
 class Definitions(Locator):
@@ -133,19 +450,110 @@ class Definitions(Locator):
 
         self.finder = DefinitionFinder(defs)
         self.injector = None  # type: Optional[Injector]
+        self.injectors = WeakSet()
+
+        # Reverse dependency index: the creation paths looked up so far, by matched key and by last element
+        self.path_keys = {}
+        self.key_paths = {}
+        self.tail_paths = {}
 
     def initialize(self, injector):
         self.injector = injector
+        self.injectors.add(injector)
+
+        # The injector starts them
+        for key, value in self.finder.definitions.items():
+            if isinstance(value, BackgroundSingleton):
+                definition = key if isinstance(key, (list, tuple)) else (key,)
+                value.get_dependency(resolve_import_ref(as_import_ref(definition[-1])), injector)
 
     def get(self, creation_path: List[Arg]) -> Optional[Dependency]:
         assert self.injector is not None
 
-        _, value = self.finder(creation_path)
+        key, value = self.finder(creation_path)
+        self._track(creation_path, key)
+
         if value is NotSet:
             return None
-        if isinstance(value, Dependency):
-            return value
-        if isinstance(value, DependencyBuilder):
-            return value.create(creation_path, self.injector)
+        return as_dependency(value, creation_path, self.injector)
+
+    def add(self, key, value):
+        """
+        Add or replace a definition.
+        The injectors using these definitions only forget the dependencies located through the creation paths
+        that the key matches, as well as the singletons built on top of them.
+        """
+        entry = self.finder.add(key, value)
+
+        if is_pattern(entry.definition) or isinstance(entry.definition[-1], ImportRef):
+            candidates = self.path_keys.keys()
         else:
-            return ValueDependency(value)
+            candidates = self.tail_paths.get(entry.definition[-1], ())
+
+        self._invalidate([path for path in candidates if entry.matches(path)])
+
+    def remove(self, key):
+        """
+        Remove a definition.
+        The injectors using these definitions only forget the dependencies that were located through it.
+        """
+        self.finder.remove(key)
+        self._invalidate(list(self.key_paths.get(key, ())))
+
+    def override(self, key, value) -> bool:
+        self.add(key, value)
+        return True
+
+    def __getstate__(self):
+        # Only the definitions, the injectors stay in this process
+        return {'definitions': self.finder.definitions}
+
+    def __setstate__(self, state):
+        self.__init__(state['definitions'])
+
+    def get_roots(self) -> Sequence[Any]:
+        """
+        Classes defined as single element keys, which are the ones that can be requested through `get`.
+        """
+        roots = []
+        for key in self.finder.definitions:
+            definition = key if isinstance(key, tuple) else (key,)
+            if len(definition) != 1:
+                continue
+            cls = resolve_import_ref(as_import_ref(definition[0]))
+            if isinstance(cls, type) and cls not in roots:
+                roots.append(cls)
+        return roots
+
+    def _track(self, creation_path: Sequence[Arg], key):
+        if creation_path in self.path_keys:
+            return
+        self.path_keys[creation_path] = key
+
+        if key is not NotSet:
+            self.key_paths.setdefault(key, set()).add(creation_path)
+
+        tail = creation_path[-1]
+        if tail.name is not None:
+            self.tail_paths.setdefault(tail.name, set()).add(creation_path)
+        self.tail_paths.setdefault(tail.cls, set()).add(creation_path)
+
+    def _untrack(self, creation_path: Sequence[Arg]):
+        key = self.path_keys.pop(creation_path, NotSet)
+
+        if key is not NotSet:
+            self.key_paths[key].discard(creation_path)
+
+        tail = creation_path[-1]
+        for tail_key in (tail.name, tail.cls):
+            paths = self.tail_paths.get(tail_key)
+            if paths:
+                paths.discard(creation_path)
+
+    def _invalidate(self, creation_paths: List[Sequence[Arg]]):
+        for creation_path in creation_paths:
+            self._untrack(creation_path)
+
+        if creation_paths:
+            for injector in list(self.injectors):
+                injector.invalidate(creation_paths)
@@ -1,10 +1,22 @@
-from typing import Union, Any, Optional, Sequence, Type, Callable
-
-from .core import Dependency, NotSet, Arg, FunctionArgs, USE_SUBCLASSING_FACTORY
+import hashlib
+import mmap
+import os
+import pickle
+from concurrent.futures import Future
+from inspect import isawaitable, iscoroutinefunction
+from threading import Thread, Lock
+from time import perf_counter
+from typing import Union, Any, Optional, Sequence, Type, Callable, Tuple
+
+from .core import Dependency, NotSet, Arg, FunctionArgs, USE_SUBCLASSING_FACTORY, logger
+from .errors import WirinjError
+from .imports import get_cls_path
 from .injector import Injector
 from .introspect import get_class_dependencies, instantiate_class, \
-    get_func_args, get_func_result
-from .tools import get_subclassing_factory, get_func_factory
+    get_func_args, get_func_result, get_private_deps, get_injecting_constructor, get_attribute_deps, \
+    supports_lazy_attributes
+from .proxy import Proxy
+from .tools import get_subclassing_factory, get_func_factory, get_cls_name
 
 
 class ValueDependency(Dependency):
@@ -15,6 +27,9 @@ class ValueDependency(Dependency):
     def get_instance(self, instance_args=None, **deps):
         return self.value
 
+    def get_constant(self):
+        return self.value
+
 
 class InstanceDependency(Dependency):
 
@@ -30,34 +45,336 @@ class InstanceDependency(Dependency):
     def get_instance(self, instance_args=None, **deps):
         return instantiate_class(self.cls, instance_args, **deps)
 
+    def get_constructor(self) -> Optional[Callable]:
+        # Private dependencies are not constructor arguments
+        if get_private_deps(self.cls):
+            return get_injecting_constructor(self.cls)
+        return self.cls
+
+    def get_attribute_dependencies(self) -> Sequence[Arg]:
+        return get_attribute_deps(self.cls) if supports_lazy_attributes(self.cls) else ()
+
 
 class SingletonWrapper(Dependency):
 
-    def __init__(self, dependency: Dependency):
+    def __init__(self, dependency: Dependency, fork_safe=True):
+        """
+        @param fork_safe: False if the instance must be created again in forked child processes.
+        """
         self.dependency = dependency
         self.instance = None
+        self.fork_safe = fork_safe
 
     def get_class(self) -> Union[Any, NotSet]:
         return self.dependency.get_class()
 
     def get_dependencies(self) -> Optional[Sequence[Arg]]:
-        if self.instance:
+        if self.instance is not None:
             return ()
         return self.dependency.get_dependencies()
 
     def get_instance(self, instance_args=None, **deps):
-        if self.instance:
+        if self.instance is not None:
             assert instance_args is None or not instance_args.args and not instance_args.kwargs
         else:
             self.instance = self.dependency.get_instance(instance_args, **deps)
         return self.instance
 
+    async def aget_instance(self, instance_args=None, **deps):
+        if self.instance is None:
+            self.instance = await self.dependency.aget_instance(instance_args, **deps)
+        return self.instance
+
+    def is_async(self) -> bool:
+        return self.instance is None and self.dependency.is_async()
+
+    def reset(self):
+        self.instance = None
+
+    def is_singleton(self) -> bool:
+        return True
+
+    def is_fork_safe(self) -> bool:
+        return self.fork_safe
+
+    def get_constant(self):
+        return NotSet if self.instance is None else self.instance
+
+
+class BackgroundSingletonWrapper(SingletonWrapper):
+    """
+    Singleton created on a worker thread as soon as it is started. The injected instance is a Future of the object,
+    or a Proxy that waits for it on first use.
+    """
+
+    def __init__(self, dependency: Dependency, injector: Injector, cls, proxy=True):
+        super().__init__(dependency)
+        self.injector = injector
+        self.cls = cls
+        self.proxy = proxy
+        self.future = None  # type: Optional[Future]
+        self.build_start = None  # type: Optional[float]
+        self.build_end = None  # type: Optional[float]
+        self.waited = 0.0
+        self.lock = Lock()
+
+    def start(self):
+        if self.instance is not None:
+            return
+
+        self.future = Future()
+        self.future.set_running_or_notify_cancel()
+        self.build_start = self.build_end = None
+        self.waited = 0.0
+        self.instance = Proxy(self.wait) if self.proxy else self.future
+
+        if self.injector.executor is not None:
+            self.injector.executor.submit(self._build, self.future)
+        else:
+            Thread(target=self._build, args=(self.future,), name='wirinj-{}'.format(self.cls.__name__),
+                   daemon=True).start()
+
+    def _build(self, future: Future):
+        self.build_start = perf_counter()
+        try:
+            instance = self.injector.build(self.dependency, self.cls)
+        except BaseException as ex:
+            self.build_end = perf_counter()
+            future.set_exception(ex)
+        else:
+            self.build_end = perf_counter()
+            future.set_result(instance)
+
+    def wait(self, timeout: Optional[float] = None):
+        """
+        @return: The singleton, once it is created.
+        """
+        future = self.future
+        if future.done():
+            return future.result()
+
+        start = perf_counter()
+        try:
+            return future.result(timeout)
+        finally:
+            with self.lock:
+                self.waited += perf_counter() - start
+
+    def get_status(self) -> Tuple[str, Optional[float], float]:
+        """
+        @return: The state ('building', 'ready' or 'failed'), the seconds spent building it, and the seconds
+        consumers have spent waiting for it.
+        """
+        if self.future is None or not self.future.done():
+            state = 'building'
+        elif self.future.exception() is not None:
+            state = 'failed'
+        else:
+            state = 'ready'
+
+        build_time = self.build_end - self.build_start if self.build_end is not None else None
+        return state, build_time, self.waited
+
+    def is_fork_safe(self) -> bool:
+        # Its thread does not survive a fork
+        return self.future is not None and self.future.done()
+
+    def reset(self):
+        # Built again in background
+        super().reset()
+        self.start()
+
+
+class ScopedDependency(Dependency):
+    """
+    Instance kept by the current scope of the injector. Its dependencies are located as if it was requested directly
+    and only created when the scope has no instance yet.
+    """
+
+    def __init__(self, dependency: Dependency, injector: Injector, cls):
+        self.dependency = dependency
+        self.injector = injector
+        self.cls = cls
+
+    def get_class(self) -> Union[Any, NotSet]:
+        return self.dependency.get_class()
+
+    def get_instance(self, instance_args=None, **deps):
+        assert instance_args is None or not instance_args.args and not instance_args.kwargs, \
+            'Scoped dependencies take no arguments'
+
+        scope = self.injector.current_scope.get()
+        if scope is None:
+            raise WirinjError('{} is scoped and there is no active scope. Use {}.scope().'.format(
+                get_cls_name(self.cls), Injector.__name__))
+
+        try:
+            return scope.instances[self]
+        except KeyError:
+            instance = scope.instances[self] = self.injector.build(self.dependency, self.cls)
+            return instance
+
+
+class PersistentDependency(Dependency):
+    """
+    Instance pickled to a cache directory once created, and restored from there by later processes instead of being
+    created again. The file depends on the class, the values located for its arguments and a version, so a change in
+    any of them creates the instance again. Its other dependencies are only created when there is no file.
+    """
+
+    def __init__(self, dependency: Dependency, injector: Injector, cls, directory: str, version=None):
+        self.dependency = dependency
+        self.injector = injector
+        self.cls = cls
+        self.directory = directory
+        self.version = version
+
+    def get_class(self) -> Union[Any, NotSet]:
+        return self.dependency.get_class()
+
+    def get_instance(self, instance_args=None, **deps):
+        assert instance_args is None or not instance_args.args and not instance_args.kwargs, \
+            'Persistent dependencies take no arguments'
+
+        try:
+            path = self.get_path()
+        except Exception as ex:
+            logger.warning('Cannot persist {}: {}'.format(get_cls_name(self.cls), ex))
+            return self.injector.build(self.dependency, self.cls)
+
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as ex:
+            logger.warning('Cannot restore {} from {}: {}'.format(get_cls_name(self.cls), path, ex))
+
+        instance = self.injector.build(self.dependency, self.cls)
+
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(instance, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as ex:
+            logger.warning('Cannot save {} to {}: {}'.format(get_cls_name(self.cls), path, ex))
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+        return instance
+
+    def get_key(self) -> Tuple:
+        """
+        @return: The class, the values located for its arguments and the version.
+        """
+        root = Arg(None, self.cls)
+        values = []
+        for arg in self.dependency.get_dependencies() or ():
+            dep = self.injector.locator.get((root, arg))
+            if isinstance(dep, ValueDependency):
+                values.append((arg.name, dep.value))
+        return get_cls_path(self.cls), tuple(values), self.version
+
+    def get_path(self) -> str:
+        digest = hashlib.sha256(pickle.dumps(self.get_key(), protocol=4)).hexdigest()[:32]
+        return os.path.join(self.directory, '{}-{}.pickle'.format(get_cls_name(self.cls), digest))
+
+
+class MappedFileDependency(Dependency):
+    """
+    File mapped into memory the first time it is injected. The processes that map the same file share its pages
+    through the page cache instead of holding a copy each. The instance is a `numpy.memmap` when NumPy is installed,
+    or a `memoryview` of an `mmap` otherwise. It is closed by `Injector.close()`, and mapped again if requested later.
+    """
+
+    def __init__(self, path: str, writable=False, dtype=None, shape=None, offset=0):
+        self.path = path
+        self.writable = writable
+        self.dtype = dtype
+        self.shape = shape
+        self.offset = offset
+        self.instance = None
+        self.mmap = None  # type: Optional[mmap.mmap]
+        self.lock = Lock()
+
+    def get_instance(self, instance_args=None, **deps):
+        assert instance_args is None or not instance_args.args and not instance_args.kwargs, \
+            'Mapped files take no arguments'
+
+        instance = self.instance
+        if instance is None:
+            with self.lock:
+                if self.instance is None:
+                    self.instance = self.open()
+                instance = self.instance
+        return instance
+
+    def open(self):
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+
+        if numpy is not None:
+            return numpy.memmap(self.path, dtype=self.dtype or numpy.uint8, mode='r+' if self.writable else 'r',
+                                offset=self.offset, shape=self.shape)
+
+        if self.dtype is not None or self.shape is not None:
+            raise WirinjError('Mapping {} with dtype or shape requires NumPy'.format(self.path))
+
+        # mmap offsets must be aligned, the rest is skipped in the view
+        start = self.offset - self.offset % mmap.ALLOCATIONGRANULARITY
+        with open(self.path, 'r+b' if self.writable else 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ,
+                                  offset=start)
+        return memoryview(self.mmap)[self.offset - start:]
+
+    def close(self):
+        """
+        Flush and unmap the file. The memoryview injected can no longer be used. A numpy.memmap, or a slice of the
+        memoryview, keeps the mapping until it is released.
+        """
+        with self.lock:
+            instance, self.instance = self.instance, None
+            mapped, self.mmap = self.mmap, None
+
+        if instance is None:
+            return
+        if mapped is None:
+            if self.writable:
+                instance.flush()
+            return
+
+        instance.release()
+        if self.writable:
+            mapped.flush()
+        try:
+            mapped.close()
+        except BufferError:
+            logger.warning('{} is still in use. It will be unmapped when released.'.format(self.path))
+
+
+FACTORY_KINDS = ('subclass', 'function')
+
 
 class FactoryDependency(Dependency):
 
-    def __init__(self, cls, injector: Injector):
+    def __init__(self, cls, injector: Injector, kind: Optional[str] = None):
+        """
+        @param kind: 'subclass' for a subclass of `cls` that creates injected instances when it is called, or
+        'function' for a plain function. By default, 'subclass' if USE_SUBCLASSING_FACTORY is set.
+        """
+        if kind is None:
+            kind = 'subclass' if USE_SUBCLASSING_FACTORY else 'function'
+        assert kind in FACTORY_KINDS, 'Factory kind must be one of {}, not {!r}'.format(FACTORY_KINDS, kind)
+
         self.cls = cls
         self.injector = injector
+        self.kind = kind
 
     def get_class(self) -> Union[Any, NotSet]:
         return Type[self.cls]
@@ -66,13 +383,32 @@ class FactoryDependency(Dependency):
         return []
 
     def get_instance(self, instance_args=None, **deps):
-        if USE_SUBCLASSING_FACTORY:
-            factory = get_subclassing_factory(self.cls, self.injector.get)
-        else:
-            factory = get_func_factory(self.cls, self.injector.get)
+        # Built once per class and kind. The injector only keeps it while it is in use.
+        key = (self.cls, self.kind)
+        factory = self.injector.factories.get(key)
+        if factory is None:
+            build = get_subclassing_factory if self.kind == 'subclass' else get_func_factory
+            factory = self.injector.factories[key] = build(self.cls, self.create, self.injector.get_many)
 
         return factory
 
+    def create(self, cls, *args, **kwargs):
+        """
+        Fast path of the factory calls: once a call signature has been resolved, its compiled plan runs directly.
+        """
+        plans = self.injector.plans
+        if plans is None:
+            return self.injector.get(cls, *args, **kwargs)
+
+        shape = (cls, len(args), tuple(kwargs))
+        runner = plans.compiled.get(shape)
+        if runner is not None:
+            return runner(args, kwargs)
+
+        instance = self.injector.get(cls, *args, **kwargs)
+        plans.get_compiled(shape)
+        return instance
+
 
 class CustomInstanceDependency(Dependency):
 
@@ -96,3 +432,15 @@ class CustomInstanceDependency(Dependency):
             return self.func(*instance_args.args, **{**deps, **instance_args.kwargs})
         else:
             return self.func(**deps)
+
+    async def aget_instance(self, instance_args: FunctionArgs = None, **deps):
+        instance = self.get_instance(instance_args, **deps)
+        if isawaitable(instance):
+            instance = await instance
+        return instance
+
+    def is_async(self) -> bool:
+        return iscoroutinefunction(self.func)
+
+    def get_constructor(self) -> Optional[Callable]:
+        return self.func
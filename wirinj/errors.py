@@ -4,3 +4,7 @@ class WirinjError(Exception):
 
 class MissingDependenciesError(WirinjError):
     pass
+
+
+class CompileError(WirinjError):
+    pass
@@ -0,0 +1,160 @@
+import sys
+from importlib import import_module
+from threading import RLock
+from time import perf_counter
+from typing import Any, List
+
+from .core import NotSet, SEPARATOR_OPEN, SEPARATOR_CLOSE
+
+
+def get_cls_path(cls) -> str:
+    return '{}.{}'.format(cls.__module__, cls.__qualname__)
+
+
+def import_by_path(path: str) -> Any:
+    """
+    Import the object referenced by a dotted path such as 'pkg.module.Class' or 'pkg.module:Class.Inner'.
+    """
+    if ':' in path:
+        module_name, attr_path = path.split(':', 1)
+        target = import_module(module_name)
+        for attr in attr_path.split('.'):
+            target = getattr(target, attr)
+        return target
+
+    parts = path.split('.')
+    for i in range(len(parts) - 1, 0, -1):
+        module_name = '.'.join(parts[:i])
+        try:
+            target = import_module(module_name)
+        except ModuleNotFoundError as ex:
+            # Only go on with a shorter module name when the missing module is the one requested
+            if ex.name != module_name:
+                raise
+            continue
+
+        for attr in parts[i:]:
+            target = getattr(target, attr)
+        return target
+
+    raise ImportError('Cannot import "{}"'.format(path))
+
+
+class ImportReport:
+    """
+    Record of the modules imported while resolving ImportRef objects. Each path is listed once, and only if its
+    resolution imported some module.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.paths = set()
+        self.modules = []
+
+    def add(self, path: str, modules: List[str], seconds: float):
+        if not modules or path in self.paths:
+            return
+        self.paths.add(path)
+        self.entries.append((path, modules, seconds))
+        self.modules += modules
+
+    def get(self) -> str:
+        if not self.entries:
+            return ''
+
+        lines = ''
+        for path, modules, seconds in self.entries:
+            lines += '    {}: {} ({:.1f} ms)\n'.format(path, ', '.join(modules), seconds * 1000)
+        return '{0}\n{1}\n\n{2}{3}'.format(
+            SEPARATOR_OPEN,
+            'Lazy imports report:',
+            lines,
+            SEPARATOR_CLOSE,
+        )
+
+
+import_report = ImportReport()
+
+# Reentrant, since the modules imported may resolve other references
+import_lock = RLock()
+
+
+class ImportRef:
+    """
+    Reference to a class, or any other module attribute, through its dotted import path.
+    The module is only imported the first time the target is required.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.dotted = path.replace(':', '.')
+        self.target = NotSet
+
+    def resolve(self) -> Any:
+        if self.target is NotSet:
+            with import_lock:
+                if self.target is NotSet:
+                    loaded = set(sys.modules)
+                    start = perf_counter()
+                    target = import_by_path(self.path)
+                    elapsed = perf_counter() - start
+                    import_report.add(self.path, sorted(set(sys.modules) - loaded), elapsed)
+                    self.target = target
+        return self.target
+
+    def matches(self, cls) -> bool:
+        """
+        Check if a class is the referenced one without importing anything.
+        A class given in the creation path is already imported, so its path can be compared. Names re-exported by
+        another module, e.g. 'pkg:Service' for pkg.services.Service, are compared with the target once the module of
+        the reference is loaded.
+        """
+        if isinstance(cls, str):
+            return cls == self.dotted
+        if not isinstance(cls, type):
+            return False
+        if get_cls_path(cls) == self.dotted:
+            return True
+        if not self.is_loaded():
+            return False
+        try:
+            return self.resolve() is cls
+        except (ImportError, AttributeError):
+            return False
+
+    def is_loaded(self) -> bool:
+        """
+        Check if the module of the target is already imported, so resolving it imports nothing new.
+        """
+        if self.target is not NotSet:
+            return True
+        module_name = self.path.split(':', 1)[0] if ':' in self.path else self.dotted.rpartition('.')[0]
+        return module_name in sys.modules
+
+    def __eq__(self, other):
+        return isinstance(other, ImportRef) and other.dotted == self.dotted
+
+    def __hash__(self):
+        return hash((ImportRef, self.dotted))
+
+    def __repr__(self):
+        return '{}({!r})'.format(ImportRef.__name__, self.path)
+
+
+def is_import_path(item) -> bool:
+    return isinstance(item, str) and '.' in item
+
+
+def as_import_ref(item):
+    """
+    Dotted strings become ImportRef objects. Argument names never contain a dot.
+    """
+    return ImportRef(item) if is_import_path(item) else item
+
+
+def resolve_import_ref(item):
+    return item.resolve() if isinstance(item, ImportRef) else item
+
+
+def get_import_report() -> str:
+    return import_report.get()
@@ -1,11 +1,31 @@
+import asyncio
+import gc
+import os
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from functools import wraps
+from inspect import iscoroutinefunction, isawaitable
+from itertools import repeat
 from logging import ERROR, INFO, DEBUG
-from typing import Union, Sequence, Callable, Optional, Dict, Tuple
+from threading import RLock, Lock, Event
+from time import perf_counter
+from typing import Union, Sequence, Callable, Optional, Dict, Tuple, Iterable, List, Any
+from weakref import WeakValueDictionary, WeakMethod
 
 from .core import logger, Arg, Dependency, NotSet, Locator, SEPARATOR_OPEN, SEPARATOR_CLOSE, FunctionArgs, \
     filter_direct_args, InjectionClauses
-from .errors import MissingDependenciesError
-from .introspect import get_func_args
+from .errors import MissingDependenciesError, WirinjError
+from .introspect import get_func_args, install_attribute_descriptors, attribute_resolvers, create_instance, \
+    get_injecting_constructor
+from .jit import compile_plan
 from .locators import LocatorChain, LocatorCache
+from .plan import PlanCache
+from .proxy import Proxy, resolve_proxy
+from .scope import Scope
+from .tools import LazyType, is_module_function
+from .spec import InjectorSpec, get_locator_reference, is_importable, set_worker_injector
+from .warmup import WarmupStep, WarmupReport
 
 
 class NotFoundType(type):
@@ -31,10 +51,12 @@ class CreationNode:
                  arg: Arg,
                  dep: Union[Dependency, NotFoundType, None],
                  childs: Sequence['CreationNode'] = (),
+                 path: Sequence[Arg] = (),
                  ):
         self.arg = arg
         self.dep = dep
         self.childs = childs
+        self.path = path
         self.instance = None
 
     def get_params(self):
@@ -105,6 +127,20 @@ def _after_tree_creation(success: bool, tree: CreationNode):
         raise MissingDependenciesError('Missing dependencies.')
 
 
+def register_after_fork(func: Callable):
+    """
+    Run the bound method `func` in every forked child process, as long as its object is alive.
+    """
+    method = WeakMethod(func)
+
+    def after_in_child():
+        bound = method()
+        if bound is not None:
+            bound()
+
+    os.register_at_fork(after_in_child=after_in_child)
+
+
 def creation_path_as_text(parent_path: Sequence[Arg], creation_node: CreationNode, suffix=''):
     path = ''
     for entry in parent_path:
@@ -136,22 +172,151 @@ class DefaultDependency(Dependency):
     def get_instance(self, instance_args=None, **deps):
         return self.default
 
+    def get_constant(self):
+        return self.default
+
+
+class CallDependency(Dependency):
+    """
+    The call of a function whose arguments are injected.
+    """
+
+    def __init__(self, func: Callable):
+        self.func = func
+
+    def get_dependencies(self) -> Optional[Sequence[Arg]]:
+        return get_func_args(self.func)
+
+    def get_instance(self, instance_args=None, **deps):
+        return self.func(*instance_args.args, **{**deps, **instance_args.kwargs})
+
+    def get_constructor(self) -> Optional[Callable]:
+        return self.func
+
+
+class LazyDependency(Dependency):
+    """
+    Proxy of a dependency which is only created when the proxy is first used.
+    Each injected proxy creates its own instance, unless the dependency is a singleton.
+    """
+
+    def __init__(self, injector: 'Injector', parent_path: Sequence[Arg], arg: Arg,
+                 dependency: Optional[Dependency] = None, proxy=True):
+        """
+        @param dependency: the dependency to create. If None, it is located through the creation path.
+        @param proxy: if False, a function that creates the dependency on its first call is injected instead.
+        """
+        self.injector = injector
+        self.parent_path = tuple(parent_path)
+        self.arg = arg
+        self.dependency = dependency
+        self.proxy = proxy
+
+    def get_class(self) -> Union[Any, NotSet]:
+        return self.arg.cls
+
+    def get_instance(self, instance_args=None, **deps):
+        if self.proxy:
+            return Proxy(self.resolve)
+
+        def provider(_proxy=Proxy(self.resolve)):
+            return resolve_proxy(_proxy)
+
+        return provider
+
+    def resolve(self):
+        injector = self.injector
+        plans = injector.plans
+        # Keyed by creation path, since a new LazyDependency is located for each request
+        current_path = self.parent_path + (self.arg,)
+        shape = (current_path, 0, ())
+        if plans is not None:
+            plan = plans.get(shape)
+            if plan is not None:
+                return plan((), {})
+
+        if self.dependency is None:
+            success, node = injector._create_node(self.parent_path, self.arg)
+        else:
+            success, node = injector._create_instance(self.parent_path, self.arg, self.dependency, current_path, None)
+        _after_tree_creation(success, node)
+
+        if plans is not None:
+            plans.add(shape, node, {})
+
+        return node.instance
+
+
+class LazyAttributesDependency(Dependency):
+    """
+    Creates the instances of `dependency` without their attribute dependencies. Each one is created on first access,
+    through an InjectedAttribute descriptor installed on the class.
+    """
+
+    def __init__(self, injector: 'Injector', parent_path: Sequence[Arg], arg: Arg, dependency: Dependency,
+                 attribute_args: Sequence[Arg]):
+        self.injector = injector
+        self.parent_path = tuple(parent_path)
+        self.arg = arg
+        self.dependency = dependency
+        self.attribute_args = {arg.name: arg for arg in attribute_args}
+        self.dependency_args = tuple(arg for arg in dependency.get_dependencies() or ()
+                                     if arg.name not in self.attribute_args)
+        self.attributes = {}  # type: Dict[str, LazyDependency]
+        install_attribute_descriptors(dependency.get_class(), self.attribute_args)
+
+    def get_class(self) -> Union[Any, NotSet]:
+        return self.dependency.get_class()
+
+    def get_dependencies(self) -> Optional[Sequence[Arg]]:
+        return self.dependency_args
+
+    def get_instance(self, instance_args=None, **deps):
+        return create_instance(self.dependency.get_class(), instance_args, deps, self.bind)
+
+    def get_constructor(self) -> Optional[Callable]:
+        return get_injecting_constructor(self.dependency.get_class(), self.bind)
+
+    def bind(self, instance):
+        # Before __init__, which may use the attributes
+        attribute_resolvers.set(instance, self)
+
+    def __call__(self, name: str):
+        attribute = self.attributes.get(name)
+        if attribute is None:
+            current_path = self.parent_path + (self.arg,)
+            path = self.injector._get_dependency_path(self.parent_path, self.arg, self.dependency, current_path)
+            attribute = self.attributes[name] = LazyDependency(self.injector, path, self.attribute_args[name])
+        return attribute.resolve()
+
 
 class Injector:
     """
     Dependency injection service.
     """
 
-    def __init__(self, *dependencies: Locator, cached=True):
+    def __init__(self, *dependencies: Locator, cached=True, jit=False, executor: Optional[Executor] = None,
+                 lazy_attributes=False):
         """
         @param dependencies: one or more Locator objects such as Dependencies or Autowiring which will be queried
         by the injector object to locate dependencies. If two Locators contain the same dependency, the first takes
         precedence.
         @param cached: if True, cached copies of already located dependecy managers (Dependency) are kept to save time.
+        Resolution plans are cached as well, so `get` only runs the constructors once a class has been created with
+        the same call signature.
+        @param jit: if True, the resolution plans are compiled into specialised Python functions. The located
+        dependencies are then fixed until they are invalidated, even if not cached.
+        @param executor: if set, e.g. a ThreadPoolExecutor, sibling dependencies are created concurrently on it the
+        first time a tree is created. Worth it when constructors block on I/O.
+        @param lazy_attributes: if True, INJECTED attributes are only created when they are first accessed.
         """
 
         assert dependencies, '{0} requires at least one {1}'.format(Injector.__name__, Locator.__name__)
 
+        # Kept for get_spec
+        self.dependencies = dependencies
+        self.options = {'cached': cached, 'jit': jit, 'lazy_attributes': lazy_attributes}
+
         if len(dependencies) == 1:
             deps = dependencies[0]
         else:
@@ -159,28 +324,450 @@ class Injector:
 
         self.locator = LocatorCache(deps) if cached else deps
 
+        # Creation paths rewritten with the actual class of their dependency, mapped to the original paths
+        self.path_aliases = {}
+
+        # Factories by (class, kind), kept while they are referenced
+        self.factories = WeakValueDictionary()
+
+        self.plans = PlanCache(compile_plan, jit) if cached or jit else None
+
+        self.executor = executor
+
+        # Dependencies with lazy attributes, by creation path
+        self.lazy_attributes = lazy_attributes
+        self.lazy_attribute_deps = {}  # type: Dict[Tuple[Arg, ...], LazyAttributesDependency]
+
+        # Locks of the singletons being created, so concurrent subtrees create each singleton once
+        self.singleton_locks = {}  # type: Dict[Dependency, RLock]
+
+        # Futures of the singletons being created by `aget`, awaited by concurrent creations of the same singleton
+        self.pending_singletons = {}  # type: Dict[Dependency, asyncio.Future]
+
+        # Scope of the current thread or asyncio task
+        self.current_scope = ContextVar('wirinj_scope_{}'.format(id(self)), default=None)
+
+        # Dependencies shared by all the creation paths of a definition, by (definition, class). Kept by the injector
+        # rather than the definition so they do not outlive it.
+        self.shared_dependencies = {}  # type: Dict[Tuple[Any, Any], Dependency]
+
+        # Singletons created on worker threads, registered by the locators on initialization
+        self.background_singletons = []  # type: List[Dependency]
+
+        # Files mapped into memory, closed by `close`
+        self.mapped_files = []  # type: List[Dependency]
+
+        # True once `after_fork` is registered, which cannot be undone
+        self.fork_registered = False
+
         self.locator.initialize(self)
 
+        for dep in self.background_singletons:
+            dep.start()
+
     def get(self, cls, *args, **kwargs):
+        plans = self.plans
+        if plans is not None:
+            # Same as get_shape(), inlined since it runs on every call
+            shape = (cls, len(args), tuple(kwargs))
+            plan = plans.get(shape)
+            if plan is not None:
+                return plan(args, kwargs)
+
         success, root = self._create_node((), Arg(None, cls), FunctionArgs(args, kwargs))
         _after_tree_creation(success, root)
+
+        if plans is not None:
+            plans.add(shape, root, kwargs)
+
+        return root.instance
+
+    async def aget(self, cls, *args, **kwargs):
+        """
+        Asynchronous version of `get`. Dependencies created by coroutine functions are awaited, and the dependencies
+        of each object are created concurrently.
+        """
+        plans = self.plans
+        if plans is not None:
+            shape = (cls, len(args), tuple(kwargs))
+            plan = plans.get(shape)
+            if plan is not None:
+                return plan(args, kwargs)
+
+        success, root = await self._acreate_node((), Arg(None, cls), FunctionArgs(args, kwargs))
+        _after_tree_creation(success, root)
+
+        if plans is not None:
+            plans.add(shape, root, kwargs)
+
         return root.instance
 
+    def get_many(self, cls, args_iterable: Union[int, Iterable[Sequence]], stream=False):
+        """
+        Create many instances of a class. The dependencies are resolved once, and then only the constructors run
+        through the compiled resolution plan.
+        @param args_iterable: the positional args of each instance, or the number of instances to create with no args.
+        @param stream: if True, return a generator instead of a list.
+        """
+        instances = self._iter_many(cls, args_iterable)
+        return instances if stream else list(instances)
+
     def call(self, func: Callable, *args, **kwargs):
+        plans = self.plans
+        if plans is not None:
+            plan = plans.get((func, len(args), tuple(kwargs)))
+            if plan is not None:
+                return plan(args, kwargs)
+
         injected_args = self._get_function_args(func, args, kwargs)
         return func(*args, **{**injected_args, **kwargs})
 
+    async def acall(self, func: Callable, *args, **kwargs):
+        """
+        Asynchronous version of `call`. The result of `func` is awaited if it is awaitable.
+        """
+        plans = self.plans
+        plan = plans.get((func, len(args), tuple(kwargs))) if plans is not None else None
+        if plan is not None:
+            result = plan(args, kwargs)
+        else:
+            injected_args = await self._aget_function_args(func, args, kwargs)
+            result = func(*args, **{**injected_args, **kwargs})
+
+        if isawaitable(result):
+            result = await result
+        return result
+
     def get_wrapper(self, func: Callable):
+        """
+        @return: A function that calls `func` with its dependencies injected. From the second call with a given
+        signature on, it runs the compiled resolution plan of the call. Coroutine functions get a coroutine function
+        wrapper which creates the dependencies as `aget` does.
+        """
+        # Introspected once, when wrapping
+        get_func_args(func)
+
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_func_wrapper(*args, **kwargs):
+                plans = self.plans
+                if plans is not None:
+                    runner = plans.compiled.get((func, len(args), tuple(kwargs)))
+                    if runner is not None:
+                        return await runner(args, kwargs)
+
+                injected_args = await self._aget_function_args(func, args, kwargs, compiled=True)
+                return await func(*args, **{**injected_args, **kwargs})
+
+            return async_func_wrapper
+
+        @wraps(func)
         def func_wrapper(*args, **kwargs):
-            injected_args = self._get_function_args(func, args, kwargs)
+            plans = self.plans
+            if plans is not None:
+                runner = plans.compiled.get((func, len(args), tuple(kwargs)))
+                if runner is not None:
+                    return runner(args, kwargs)
+
+            injected_args = self._get_function_args(func, args, kwargs, compiled=True)
             return func(*args, **{**injected_args, **kwargs})
 
         return func_wrapper
 
-    def _get_function_args(self, func: Callable, args, kwargs):
+    def build(self, dependency: Dependency, cls):
+        """
+        Create an instance of `dependency`, with its dependencies injected as if it had been located for `cls`.
+        The instance is not kept, even if `dependency` is a singleton.
+        """
+        plans = self.plans
+        if plans is not None:
+            plan = plans.get((dependency, 0, ()))
+            if plan is not None:
+                return plan((), {})
+
+        arg = Arg(None, cls)
+        success, root = self._create_instance((), arg, dependency, (arg,), None)
+        _after_tree_creation(success, root)
+
+        if plans is not None:
+            plans.add((dependency, 0, ()), root, {})
+
+        return root.instance
+
+    def warmup(self, roots: Optional[Iterable[Any]] = None, executor: Optional[Executor] = None) -> WarmupReport:
+        """
+        Create every singleton reachable from `roots`, the singletons it depends on first, so no later `get` pays for
+        them.
+        @param roots: classes to start from. By default, the classes that the locators can tell, e.g. the single
+        element keys of the Definitions.
+        @param executor: if set, independent singletons are created concurrently on it.
+        @return: The time spent on each singleton. Singletons which fail, or depend on a failed one, are reported and
+        do not stop the warmup.
+        """
+        return self._warmup(roots, executor)
+
+    def _warmup(self, roots: Optional[Iterable[Any]], executor: Optional[Executor], fork_safe_only=False
+                ) -> WarmupReport:
+        steps = []  # type: List[WarmupStep]
+        found = {}  # type: Dict[Dependency, WarmupStep]
+        for cls in self.locator.get_roots() if roots is None else roots:
+            self._find_singletons((), Arg(None, cls), found, steps, None, fork_safe_only)
+
+        start = perf_counter()
+        if executor is None:
+            for step in steps:
+                self._warmup_step(step)
+        else:
+            self._warmup_concurrently(steps, executor)
+
+        return WarmupReport(steps, perf_counter() - start)
+
+    def prefork(self, roots: Optional[Iterable[Any]] = None, executor: Optional[Executor] = None,
+                register=True) -> WarmupReport:
+        """
+        Prepare the injector of a pre-forking server master, so the workers share the memory of its singletons.
+        The fork-safe singletons are created as `warmup` does, except the ones that depend on fork-unsafe
+        singletons. Then the objects are moved out of the reach of the garbage collector with `gc.freeze()` (Python
+        3.7+), so collections in the workers do not copy the memory pages they are in.
+        @param register: if True, `after_fork` is run in every child process (Python 3.7+). Otherwise, run it from
+        the post fork hook of the server.
+        """
+        report = self._warmup(roots, executor, fork_safe_only=True)
+
+        gc.collect()
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+
+        if register and not self.fork_registered and hasattr(os, 'register_at_fork'):
+            register_after_fork(self.after_fork)
+            self.fork_registered = True
+
+        return report
+
+    def after_fork(self):
+        """
+        Forget, in a forked child process, the fork-unsafe singletons created by the parent and the singletons built
+        on top of them, so they are created again. The background singletons not ready are started again.
+        """
+        self.singleton_locks = {}
+        self.pending_singletons = {}
+
+        unsafe = []
+        if isinstance(self.locator, LocatorCache):
+            for path, dep in list(self.locator.cache.items()):
+                if dep and not dep.is_fork_safe():
+                    unsafe.append((path, dep))
+
+        for _, dep in unsafe:
+            dep.reset()
+        if unsafe:
+            self.invalidate([path for path, _ in unsafe])
+
+    def get_spec(self) -> InjectorSpec:
+        """
+        @return: A picklable description of the injector. The locators are referenced by their import path, so
+        definitions with lambdas can be sent to other processes, as long as they are module globals. The executor is
+        not included.
+        """
+        shapes = []
+        if self.plans is not None:
+            shapes = [shape for shape in self.plans.plans if is_importable(shape[0])]
+        return InjectorSpec([get_locator_reference(locator) for locator in self.dependencies], self.options, shapes)
+
+    @classmethod
+    def from_spec(cls, spec: InjectorSpec) -> 'Injector':
+        """
+        Create the injector described by `spec`, with the dependencies of its known calls already located.
+        """
+        injector = cls(*spec.get_locators(), **spec.options)
+        injector.preload(spec.shapes)
+        return injector
+
+    @staticmethod
+    def initializer(spec: InjectorSpec, warmup=False):
+        """
+        Initializer of the worker processes of a pool, e.g.
+        `ProcessPoolExecutor(initializer=Injector.initializer, initargs=(injector.get_spec(),))`.
+        The tasks get the injector of their process from `get_worker_injector()`.
+        @param warmup: if True, the singletons are created as well.
+        """
+        injector = Injector.from_spec(spec)
+        if warmup:
+            injector.warmup()
+        set_worker_injector(injector)
+
+    def preload(self, shapes: Iterable[Tuple[Any, int, Tuple[str, ...]]]):
+        """
+        Locate and introspect the dependencies of the given (class or function, number of positional arguments,
+        keyword argument names), so the first calls do not pay for it. Nothing is instantiated.
+        """
+        located = {}
+        for target, args_count, kwargs_names in shapes:
+            placeholders = (None,) * args_count
+            kwargs = dict.fromkeys(kwargs_names)
+            if isinstance(target, type):
+                self._locate_node((), Arg(None, target), FunctionArgs(placeholders, kwargs), located)
+            else:
+                root_arg = Arg(target.__name__, type(target))
+                for arg in filter_direct_args(get_func_args(target), placeholders, kwargs):
+                    self._locate_node((root_arg,), arg, None, located)
+
+    @contextmanager
+    def scope(self):
+        """
+        Context manager of a scope, e.g. a request. Within it, each `Scoped` dependency is created once. The scope
+        is bound to the current thread or asyncio task, and its instances are released when it ends.
+        """
+        scope = Scope()
+        token = self.current_scope.set(scope)
+        try:
+            yield scope
+        finally:
+            self.current_scope.reset(token)
+            scope.close()
+
+    def wait_background(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the background singletons are created, e.g. for a readiness check.
+        @return: False if some of them are not ready after `timeout` seconds or failed.
+        """
+        end = perf_counter() + timeout if timeout is not None else None
+        for dep in self.background_singletons:
+            try:
+                dep.wait(None if end is None else max(0.0, end - perf_counter()))
+            except Exception:
+                return False
+        return True
+
+    def get_background_report(self) -> str:
+        """
+        @return: The state of each background singleton, how long it took to create it, and the time spent waiting for
+        it by its consumers.
+        """
+        if not self.background_singletons:
+            return ''
+
+        lines = ''
+        for dep in self.background_singletons:
+            state, build_time, waited = dep.get_status()
+            lines += '    {}: {}{}, waited {:.1f} ms\n'.format(
+                dep.cls.__name__, state, '' if build_time is None else ' in {:.1f} ms'.format(build_time * 1000),
+                waited * 1000)
+        return '{0}\n{1}\n\n{2}{3}'.format(
+            SEPARATOR_OPEN,
+            'Background singletons report:',
+            lines,
+            SEPARATOR_CLOSE,
+        )
+
+    def close(self):
+        """
+        Close the files mapped into memory, e.g. when the process shuts down. Also called on exit when the injector is
+        used as a context manager.
+        """
+        for dep in self.mapped_files:
+            dep.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def locate(self, cls, *args, **kwargs) -> Tuple[bool, CreationNode]:
+        """
+        Locate the dependency tree that `get` would create, without creating any instance.
+        A singleton is only expanded the first time it appears in the tree.
+        @return: Returns two values. The first value is True if all the dependencies were found. The second is the
+        root node.
+        """
+        return self._locate_node((), Arg(None, cls), FunctionArgs(args, kwargs), {})
+
+    def override(self, key, value):
+        """
+        Add or replace a definition in the first locator that accepts definitions, usually a Definitions object.
+        Only the dependencies depending on that key are located and created again.
+        """
+        if not self.locator.override(key, value):
+            raise WirinjError('No locator accepts the definition {}.'.format(key))
+
+    def invalidate(self, creation_paths: Iterable[Sequence[Arg]]):
+        """
+        Forget the dependencies located for the given creation paths and reset the singletons that were built
+        on top of them.
+        """
+        creation_paths = [tuple(path) for path in creation_paths]
+
+        if self.plans is not None:
+            self.plans.clear()
+
+        if not isinstance(self.locator, LocatorCache):
+            return
+
+        self.locator.invalidate(creation_paths)
+
+        for creation_path in creation_paths:
+            for depth in range(len(creation_path) - 1, 0, -1):
+                prefix = creation_path[:depth]
+                for lookup_path in self.path_aliases.get(prefix, set()) | {prefix}:
+                    dep = self.locator.peek(lookup_path)
+                    if dep:
+                        dep.reset()
+
+    def _iter_many(self, cls, args_iterable: Union[int, Iterable[Sequence]]):
+        if isinstance(args_iterable, int):
+            args_iterable = repeat((), args_iterable)
+
+        kwargs = {}
+        runners = {}
+        for args in args_iterable:
+            args = tuple(args)
+            runner = runners.get(len(args))
+            if runner is not None:
+                yield runner(args, kwargs)
+                continue
+
+            # The first instance resolves the plan of its call signature, which is then compiled for the rest
+            yield self.get(cls, *args)
+            runner = self.plans.get_compiled((cls, len(args), ())) if self.plans is not None else None
+            runners[len(args)] = runner or self._get_fallback_runner(cls)
+
+    def _get_fallback_runner(self, cls):
+        def get(args, kwargs):
+            return self.get(cls, *args, **kwargs)
+
+        return get
+
+    def _get_function_args(self, func: Callable, args, kwargs, compiled=False):
+        """
+        @param compiled: if True, compile the resolution plan of the call for the next ones.
+        """
         fn_args = get_func_args(func)
         injectable_args = filter_direct_args(fn_args, args, kwargs)
-        return self._create_virtual_node(injectable_args, Arg(func.__name__, type(func)))
+        root = self._create_virtual_node(injectable_args, Arg(func.__name__, type(func)), CallDependency(func))
+        self._add_call_plan(func, args, kwargs, root, compiled)
+        return root.get_params()
+
+    async def _aget_function_args(self, func: Callable, args, kwargs, compiled=False):
+        fn_args = get_func_args(func)
+        injectable_args = filter_direct_args(fn_args, args, kwargs)
+        root_arg = Arg(func.__name__, type(func))
+
+        success, childs = await self._acreate_childs(injectable_args, [root_arg])
+        root = CreationNode(root_arg, CallDependency(func), childs)
+        _after_tree_creation(success, root)
+
+        self._add_call_plan(func, args, kwargs, root, compiled)
+        return root.get_params()
+
+    def _add_call_plan(self, func: Callable, args, kwargs, root: CreationNode, compiled: bool):
+        # The plan keeps `func`, so plans of `call` are only kept for functions which live anyway. Closures and
+        # lambdas are usually created for a single call. Wrappers ask for compiled plans.
+        if self.plans is not None and (compiled or is_module_function(func)):
+            shape = (func, len(args), tuple(kwargs))
+            self.plans.add(shape, root, kwargs)
+            if compiled:
+                self.plans.get_compiled(shape)
 
     def _create_childs(self, arg_list: Optional[Sequence[Arg]], creation_path: Sequence[Arg]) -> Tuple[
         bool, Sequence[CreationNode]]:
@@ -191,6 +778,9 @@ class Injector:
         if not arg_list:
             return True, ()
 
+        if self.executor is not None and len(arg_list) > 1:
+            return self._create_childs_concurrently(arg_list, creation_path)
+
         childs = []
         success = True
         for arg in arg_list:
@@ -200,6 +790,44 @@ class Injector:
             childs.append(child)
         return success, childs
 
+    def _create_childs_concurrently(self, arg_list: Sequence[Arg], creation_path: Sequence[Arg]) -> Tuple[
+        bool, Sequence[CreationNode]]:
+        """
+        Same as `_create_childs` but the siblings are created on the executor. The first one, and any other not
+        started yet when its result is needed, are created in the current thread, so nested creations never wait
+        for a busy executor.
+        """
+        # Each task runs in a copy of the current context, so it sees the current scope
+        futures = [self.executor.submit(copy_context().run, self._create_node, creation_path, arg)
+                   for arg in arg_list[1:]]
+
+        results = []
+        error = None
+        try:
+            results.append(self._create_node(creation_path, arg_list[0]))
+        except BaseException as ex:
+            error = ex
+
+        for arg, future in zip(arg_list[1:], futures):
+            if future.cancel():
+                # Not started. After an error, the remaining siblings are not created, as in serial mode.
+                if error is None:
+                    try:
+                        results.append(self._create_node(creation_path, arg))
+                    except BaseException as ex:
+                        error = ex
+            else:
+                try:
+                    results.append(future.result())
+                except BaseException as ex:
+                    error = error or ex
+
+        if error is not None:
+            raise error
+
+        success = all(child_success for child_success, _ in results)
+        return success, [child for _, child in results]
+
     def _create_node(self, parent_path: Sequence[Arg], arg: Arg, instance_args: Optional[FunctionArgs] = None) -> Tuple[
         bool, CreationNode]:
         """
@@ -208,23 +836,30 @@ class Injector:
         """
         current_path = tuple(parent_path) + (arg,)
 
-        # Find in the locator
-        dep = self.locator.get(current_path)
+        dep = self._find_dependency(parent_path, arg, current_path)
         if not dep:
-            if has_a_valid_default(arg):
-                dep = DefaultDependency(arg.default)
-            else:
-                return False, CreationNode(current_path[-1], NotFound)
+            return False, CreationNode(current_path[-1], NotFound)
+
+        if dep.is_async():
+            raise WirinjError('{} is created by a coroutine function. Use {}.aget or {}.acall instead.'.format(
+                creation_path_as_text(parent_path, CreationNode(arg, dep)), Injector.__name__, Injector.__name__))
+
+        # Concurrent creations of the same singleton wait for the first one
+        if self.executor is not None and dep.is_singleton() and dep.get_constant() is NotSet:
+            # setdefault is atomic, so every thread gets the same lock
+            with self.singleton_locks.setdefault(dep, RLock()):
+                return self._create_instance(parent_path, arg, dep, current_path, instance_args)
 
+        return self._create_instance(parent_path, arg, dep, current_path, instance_args)
+
+    def _create_instance(self, parent_path: Sequence[Arg], arg: Arg, dep: Dependency, current_path: Tuple[Arg, ...],
+                         instance_args: Optional[FunctionArgs]) -> Tuple[bool, CreationNode]:
         # Get dependency args
         dep_args = dep.get_dependencies()
 
         # With args
         if dep_args:
-            # Update path with actual class
-            cls = dep.get_class()
-            if cls is not NotSet and cls != arg.cls:
-                current_path = list(parent_path) + [Arg(arg.name, cls, arg.default)]
+            current_path = self._get_dependency_path(parent_path, arg, dep, current_path)
 
             # Remove instance args
             if instance_args:
@@ -263,10 +898,278 @@ class Injector:
         # Return full node
         return True, creation_node
 
-    def _create_virtual_node(self, args: Sequence[Arg], root_arg: Arg):
+    async def _acreate_childs(self, arg_list: Optional[Sequence[Arg]], creation_path: Sequence[Arg]) -> Tuple[
+        bool, Sequence[CreationNode]]:
+        """
+        Asynchronous version of `_create_childs`. Sibling dependencies are created concurrently.
+        """
+        if not arg_list:
+            return True, ()
+
+        if len(arg_list) == 1:
+            results = [await self._acreate_node(creation_path, arg_list[0])]
+        else:
+            results = await asyncio.gather(*(self._acreate_node(creation_path, arg) for arg in arg_list))
+
+        success = all(child_success for child_success, _ in results)
+        return success, [child for _, child in results]
+
+    async def _acreate_node(self, parent_path: Sequence[Arg], arg: Arg, instance_args: Optional[FunctionArgs] = None
+                            ) -> Tuple[bool, CreationNode]:
+        """
+        Asynchronous version of `_create_node`.
+        """
+        current_path = tuple(parent_path) + (arg,)
+
+        dep = self._find_dependency(parent_path, arg, current_path)
+        if not dep:
+            return False, CreationNode(current_path[-1], NotFound)
+
+        if not dep.is_singleton() or dep.get_constant() is not NotSet:
+            return await self._acreate_instance(parent_path, arg, dep, current_path, instance_args)
+
+        # Singletons are created once. Concurrent creations wait for the first one.
+        pending = self.pending_singletons.get(dep)
+        if pending is not None:
+            creation_node = CreationNode(current_path[-1], dep)
+            creation_node.instance = await asyncio.shield(pending)
+            return True, creation_node
+
+        pending = self.pending_singletons[dep] = asyncio.get_event_loop().create_future()
+        try:
+            success, creation_node = await self._acreate_instance(parent_path, arg, dep, current_path, instance_args)
+            if success:
+                pending.set_result(creation_node.instance)
+            else:
+                pending.set_exception(MissingDependenciesError('Missing dependencies.'))
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except BaseException as ex:
+            pending.set_exception(ex)
+            raise
+        finally:
+            del self.pending_singletons[dep]
+            # Nobody may be waiting for it: mark the exception as retrieved
+            if not pending.cancelled():
+                pending.exception()
+
+        return success, creation_node
+
+    async def _acreate_instance(self, parent_path: Sequence[Arg], arg: Arg, dep: Dependency,
+                                current_path: Tuple[Arg, ...], instance_args: Optional[FunctionArgs]
+                                ) -> Tuple[bool, CreationNode]:
+        # Get dependency args
+        dep_args = dep.get_dependencies()
+
+        # With args
+        if dep_args:
+            current_path = self._get_dependency_path(parent_path, arg, dep, current_path)
+
+            # Remove instance args
+            if instance_args:
+                dep_args = filter_direct_args(dep_args, instance_args.args, instance_args.kwargs)
+
+            # Create childs concurrently
+            childs_success, childs = await self._acreate_childs(dep_args, current_path)
+            params = get_creation_args(childs)
+
+        # With no args
+        else:
+            childs = ()
+            params = {}
+            childs_success = True
+
+        creation_node = CreationNode(current_path[-1], dep, childs)
+
+        if not childs_success:
+            return False, creation_node
+
+        try:
+            creation_node.instance = await dep.aget_instance(instance_args, **params)
+        except BaseException as ex:
+            creation_node.instance = Failed
+            logger.fatal(SEPARATOR_OPEN)
+            logger.fatal('Instantiation ERROR:')
+            logger.fatal(creation_path_as_text(parent_path, creation_node, ex.__class__.__name__))
+            logger.fatal(SEPARATOR_CLOSE)
+            raise ex
+
+        return True, creation_node
+
+    def _find_singletons(self, parent_path: Sequence[Arg], arg: Arg, found: Dict[Dependency, WarmupStep],
+                         steps: List[WarmupStep], owner: Optional[WarmupStep], fork_safe_only=False) -> bool:
+        """
+        Add the singletons not created yet under `arg` to `steps`, each one after the singletons it depends on.
+        @param fork_safe_only: if True, the fork-unsafe singletons and the ones that depend on them are left out.
+        @return: False if a singleton was left out under `arg`.
+        """
+        current_path = tuple(parent_path) + (arg,)
+        dep = self._find_dependency(parent_path, arg, current_path)
+        if not dep or dep.get_constant() is not NotSet or dep.is_async():
+            return True
+
+        step = owner
+        if dep.is_singleton():
+            step = found.get(dep)
+            if step is not None:
+                if owner is not None:
+                    owner.requires.add(step)
+                return step.fork_safe
+
+            step = found[dep] = WarmupStep(dep, parent_path, arg,
+                                           creation_path_as_text(parent_path, CreationNode(arg, dep)))
+            step.fork_safe = not fork_safe_only or dep.is_fork_safe()
+            if owner is not None:
+                owner.requires.add(step)
+
+        included = step is None or step.fork_safe
+        dep_args = dep.get_dependencies()
+        if dep_args:
+            path = self._get_dependency_path(parent_path, arg, dep, current_path)
+            for child_arg in dep_args:
+                included = self._find_singletons(path, child_arg, found, steps, step, fork_safe_only) and included
+
+        if step is not owner:
+            step.fork_safe = included
+            if included:
+                steps.append(step)
+        return included
+
+    def _warmup_step(self, step: WarmupStep):
+        failed = [required for required in step.requires if required.error is not None]
+        if failed:
+            step.error = failed[0].error
+            return
+
+        start = perf_counter()
+        try:
+            success, root = self._create_node(step.parent_path, step.arg)
+            _after_tree_creation(success, root)
+        except Exception as ex:
+            step.error = ex
+        step.seconds = perf_counter() - start
+
+    def _warmup_concurrently(self, steps: List[WarmupStep], executor: Executor):
+        """
+        Each step is submitted as soon as the steps it requires are done.
+        """
+        if not steps:
+            return
+
+        waiting = {step: len(step.requires) for step in steps}
+        dependents = {step: [] for step in steps}
+        for step in steps:
+            for required in step.requires:
+                dependents[required].append(step)
+
+        lock = Lock()
+        done = Event()
+        remaining = [len(steps)]
+
+        def finish(step: WarmupStep):
+            ready = []
+            with lock:
+                for dependent in dependents[step]:
+                    waiting[dependent] -= 1
+                    if not waiting[dependent]:
+                        ready.append(dependent)
+                remaining[0] -= 1
+                if not remaining[0]:
+                    done.set()
+            for dependent in ready:
+                submit(dependent)
+
+        def submit(step: WarmupStep):
+            try:
+                executor.submit(run, step)
+            except Exception as ex:
+                # E.g. the executor is shutting down. Its dependents are not created either.
+                step.error = ex
+                finish(step)
+
+        def run(step: WarmupStep):
+            try:
+                self._warmup_step(step)
+            finally:
+                finish(step)
+
+        for step in steps:
+            if not step.requires:
+                submit(step)
+        done.wait()
+
+    def _find_dependency(self, parent_path: Sequence[Arg], arg: Arg, current_path: Tuple[Arg, ...]
+                         ) -> Optional[Dependency]:
+        # Lazy[T] arguments get a proxy of the T located through the same creation path
+        if type(arg.cls) is LazyType:
+            return LazyDependency(self, parent_path, Arg(arg.name, arg.cls.cls, arg.default))
+
+        # Find in the locator
+        dep = self.locator.get(current_path)
+        if not dep:
+            if has_a_valid_default(arg):
+                dep = DefaultDependency(arg.default)
+            return dep
+
+        if self.lazy_attributes and not dep.is_singleton():
+            attribute_args = dep.get_attribute_dependencies()
+            if attribute_args:
+                lazy_dep = self.lazy_attribute_deps.get(current_path)
+                if lazy_dep is None or lazy_dep.dependency is not dep:
+                    lazy_dep = LazyAttributesDependency(self, parent_path, arg, dep, attribute_args)
+                    self.lazy_attribute_deps[current_path] = lazy_dep
+                return lazy_dep
+
+        return dep
+
+    def _get_dependency_path(self, parent_path: Sequence[Arg], arg: Arg, dep: Dependency,
+                             current_path: Tuple[Arg, ...]) -> Tuple[Arg, ...]:
+        """
+        Update path with the actual class of the dependency.
+        """
+        cls = dep.get_class()
+        if cls is not NotSet and cls != arg.cls:
+            lookup_path = current_path
+            current_path = tuple(parent_path) + (Arg(arg.name, cls, arg.default),)
+            self.path_aliases.setdefault(current_path, set()).add(lookup_path)
+        return current_path
+
+    def _locate_node(self, parent_path: Sequence[Arg], arg: Arg, instance_args: Optional[FunctionArgs],
+                     located: Dict[int, Dependency]) -> Tuple[bool, CreationNode]:
+        current_path = tuple(parent_path) + (arg,)
+
+        dep = self._find_dependency(parent_path, arg, current_path)
+        if not dep:
+            return False, CreationNode(arg, NotFound, path=current_path)
+
+        # Expand shared singletons once
+        if dep.is_singleton():
+            if id(dep) in located:
+                return True, CreationNode(arg, dep, path=current_path)
+            located[id(dep)] = dep
+
+        dep_args = dep.get_dependencies()
+        if not dep_args:
+            return True, CreationNode(arg, dep, path=current_path)
+
+        current_path = self._get_dependency_path(parent_path, arg, dep, current_path)
+        if instance_args:
+            dep_args = filter_direct_args(dep_args, instance_args.args, instance_args.kwargs)
+
+        success = True
+        childs = []
+        for child_arg in dep_args:
+            child_success, child = self._locate_node(current_path, child_arg, None, located)
+            success = success and child_success
+            childs.append(child)
+
+        return success, CreationNode(current_path[-1], dep, childs, current_path)
+
+    def _create_virtual_node(self, args: Sequence[Arg], root_arg: Arg, dep: Optional[Dependency] = None):
 
         # Create tree of dependencies
         success, childs = self._create_childs(args, [root_arg])
-        root = CreationNode(root_arg, None, childs)
+        root = CreationNode(root_arg, dep, childs)
         _after_tree_creation(success, root)
-        return root.get_params()
+        return root
@@ -1,16 +1,134 @@
 import sys
+from functools import wraps
 from inspect import getfullargspec, signature, Signature, Parameter, _empty
-from typing import Sequence, Callable, Optional, get_type_hints
+from threading import Lock, local
+from typing import Sequence, Callable, Optional, get_type_hints, Any, Dict, Union, Tuple
+from weakref import WeakKeyDictionary, ref
 
 from .core import Arg, NotSet, DEPS_METHOD, FunctionArgs, NotSetType, DEPENDENCIES_ARG, \
     QUERY_WRAPPED_METHOD, InjectionClauses, INJECTED
+from .metadata import MetadataCache, get_active_cache, set_active_cache
+from .tools import LazyType
+
+
+class IntrospectionCache:
+    """
+    In-memory results of the introspection functions, by class or function. The keys are weak references, so
+    classes and functions are not kept alive by the cache.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.entries = WeakKeyDictionary()  # type: WeakKeyDictionary[Any, Dict[str, Any]]
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name: str, target, collect: Callable[[Any], Any]) -> Any:
+        try:
+            results = self.entries.get(target)
+        except TypeError:
+            # Not hashable or not weak referenceable
+            self.misses += 1
+            return collect(target)
+
+        if results is not None:
+            try:
+                result = results[name]
+                self.hits += 1
+                return result
+            except KeyError:
+                pass
+
+        self.misses += 1
+        result = collect(target)
+        try:
+            with self.lock:
+                self.entries.setdefault(target, {})[name] = result
+        except TypeError:
+            pass
+        return result
+
+    def invalidate(self, target=None):
+        """
+        @param target: a class or a function. The subclasses of a class are invalidated as well. All if None.
+        """
+        with self.lock:
+            if target is None:
+                self.entries.clear()
+                return
+
+            for key in list(self.entries.keys()):
+                if key is target or isinstance(target, type) and isinstance(key, type) and target in key.__mro__:
+                    del self.entries[key]
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self.entries),
+        }
+
+
+introspection_cache = IntrospectionCache()
+
+
+def memoized(collect: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """
+    Keep the results of an introspection function in the introspection cache. They must not be modified.
+    """
+    name = collect.__name__
+
+    @wraps(collect)
+    def get(target):
+        return introspection_cache.get(name, target, collect)
+
+    return get
+
+
+def invalidate_introspection(target=None):
+    """
+    Forget the introspection results of a class, and its subclasses, or of a function. All of them if None.
+    Required when classes are modified at run time, e.g. on hot reload.
+    """
+    introspection_cache.invalidate(target)
+
+
+def use_metadata_cache(cache: Union[str, MetadataCache, None]) -> Optional[MetadataCache]:
+    """
+    Keep the introspection results of the whole process in a file, so other processes do not compute them again.
+    Introspection is process wide, so this applies to every injector. Call it once at start up.
+    @param cache: path of the file, or a MetadataCache object. None stops using a cache.
+    @return: The cache in use.
+    """
+    if cache is not None and not isinstance(cache, MetadataCache):
+        cache = MetadataCache(cache)
+    set_active_cache(cache)
+    # Results already in memory would never be written to the new cache file
+    invalidate_introspection()
+    return cache
+
+
+def get_introspection_stats() -> Dict[str, int]:
+    return introspection_cache.get_stats()
 
 
 def is_builtin_cls(annotation) -> [NotSetType, bool]:
     return NotSet if annotation is NotSet else annotation.__module__ == 'builtins'
 
 
-def get_deps_from_signature(signature: Signature, exclude_first=False) -> Sequence[Arg]:
+def resolve_forward_ref(annotation, namespace: Optional[Dict[str, Any]]):
+    """
+    Replace `Lazy['Name']` by `Lazy[Name]` if `Name` is defined in `namespace`.
+    @param namespace: globals of the module where the annotation is written.
+    """
+    if type(annotation) is LazyType and isinstance(annotation.cls, str) and namespace:
+        cls = namespace.get(annotation.cls)
+        if cls is not None:
+            return LazyType(cls)
+    return annotation
+
+
+def get_deps_from_signature(signature: Signature, exclude_first=False, namespace=None) -> Sequence[Arg]:
     result = []
 
     first = True
@@ -20,13 +138,14 @@ def get_deps_from_signature(signature: Signature, exclude_first=False) -> Sequen
             continue
         if param.kind in [Parameter.VAR_POSITIONAL, Parameter.VAR_KEYWORD]:
             continue
-        annotation = NotSet if param.annotation is _empty else param.annotation
+        annotation = NotSet if param.annotation is _empty else resolve_forward_ref(param.annotation, namespace)
         default = NotSet if param.default is _empty else param.default
         result.append(Arg(name, annotation, default))
     return result
 
 
 
+@memoized
 def get_func_result(func: Callable) -> Sequence[Arg]:
     assert isinstance(func, Callable), \
         '"{}" must be Callable'.format(func.__name__)
@@ -35,11 +154,20 @@ def get_func_result(func: Callable) -> Sequence[Arg]:
     return NotSet if sign.return_annotation is Parameter.empty else sign.return_annotation
 
 
+@memoized
 def get_func_args(func: Callable) -> Sequence[Arg]:
     assert isinstance(func, Callable), \
         '"{}" must be Callable'.format(func.__name__)
 
-    return get_deps_from_signature(signature(func))
+    cache = get_active_cache()
+    if cache is not None:
+        return tuple(cache.get_func_args(func, collect_func_args))
+
+    return tuple(collect_func_args(func))
+
+
+def collect_func_args(func: Callable) -> Sequence[Arg]:
+    return get_deps_from_signature(signature(func), namespace=getattr(func, '__globals__', None))
 
 
 def get_method_args(cls, method_name) -> Sequence[Arg]:
@@ -50,9 +178,10 @@ def get_method_args(cls, method_name) -> Sequence[Arg]:
     assert isinstance(method, Callable), \
         '"{0}.{1}" must be Callable'.format(cls.__name__, method_name)
 
-    return get_deps_from_signature(signature(method), True)
+    return get_deps_from_signature(signature(method), True, getattr(method, '__globals__', None))
 
 
+@memoized
 def has_init_injection(cls) -> bool:
     init_method = getattr(cls, '__init__')
 
@@ -70,7 +199,23 @@ def has_init_injection(cls) -> bool:
     return False
 
 
+def get_cached_class_entry(kind: str, cls, collect: Callable[[Any], Sequence[Arg]]) -> Sequence[Arg]:
+    """
+    The result of `collect`, from the active metadata cache if there is one.
+    """
+    cache = get_active_cache()
+    if cache is not None:
+        return tuple(cache.get_class_entry(kind, cls, collect))
+
+    return tuple(collect(cls))
+
+
+@memoized
 def get_signature_deps(cls) -> Sequence[Arg]:
+    return get_cached_class_entry('signature', cls, collect_signature_deps)
+
+
+def collect_signature_deps(cls) -> Sequence[Arg]:
     args = []
 
     # Base deps
@@ -83,9 +228,10 @@ def get_signature_deps(cls) -> Sequence[Arg]:
     if method:
         args += get_method_args(cls, DEPS_METHOD)
 
-    return args
+    return tuple(args)
 
 
+@memoized
 def get_init_deps(cls) -> Sequence[Arg]:
     init_method = getattr(cls, '__init__')
     if not init_method:
@@ -93,31 +239,44 @@ def get_init_deps(cls) -> Sequence[Arg]:
 
     if has_init_injection(cls):
         real_init = init_method(QUERY_WRAPPED_METHOD)
-        return get_deps_from_signature(signature(real_init), True)
+        return tuple(get_deps_from_signature(signature(real_init), True, getattr(real_init, '__globals__', None)))
 
     else:
-        return get_method_args(cls, '__init__')
+        return tuple(get_method_args(cls, '__init__'))
 
 
+@memoized
 def get_attribute_deps(cls) -> Sequence[Arg]:
+    return get_cached_class_entry('attributes', cls, collect_attribute_deps)
+
+
+def collect_attribute_deps(cls) -> Sequence[Arg]:
 
     # Field annotations available from Python 3.6
     if (sys.version_info.major == 3 and sys.version_info.minor < 6):
-        return []
+        return ()
 
     result = []
 
     hints = get_type_hints(cls)
+    module = sys.modules.get(cls.__module__)
+    namespace = vars(module) if module else None
     for att in (dir(cls)):
         if att[:2] != '__' and getattr(cls, att, None) == INJECTED:
-            result.append(Arg(att, hints.get(att, NotSet), NotSet))
+            result.append(Arg(att, resolve_forward_ref(hints.get(att, NotSet), namespace), NotSet))
+
+    return tuple(result)
 
-    return result
 
+@memoized
 def get_class_dependencies(cls) -> Sequence[Arg]:
+    return get_cached_class_entry('class', cls, collect_class_dependencies)
+
+
+def collect_class_dependencies(cls) -> Sequence[Arg]:
 
     # __init__ args must come first to know the position of its arguments
-    args = get_init_deps(cls)
+    args = list(get_init_deps(cls))
 
     args += get_attribute_deps(cls)
     args += get_signature_deps(cls)
@@ -125,11 +284,24 @@ def get_class_dependencies(cls) -> Sequence[Arg]:
 
 
 
-def subclass_inject(cls, args, kwargs, kwinject):
+injecting_subclasses = WeakKeyDictionary()  # type: WeakKeyDictionary[type, type]
+
+# Attributes to set by the injecting subclasses, per thread. A stack, since __init__ may inject other objects.
+pending_injections = local()
+
+
+def get_injecting_subclass(cls) -> type:
+    """
+    Subclass of `cls` whose __new__ creates a `cls` instance with the pending attributes set before __init__.
+    Created once per class, and kept while `cls` is alive.
+    """
+    subclass = injecting_subclasses.get(cls)
+    if subclass is not None:
+        return subclass
 
-    #Injector = type(cls.__name__, (cls,), {'__metaclass__': WirinjMeta})
     class Injector(cls):
         def __new__(injector_cls, *args, **kwargs):
+            kwinject, before_init = pending_injections.stack.pop()
 
             super_new = super(Injector, injector_cls).__new__
             if super_new is object.__new__:
@@ -140,18 +312,191 @@ def subclass_inject(cls, args, kwargs, kwinject):
             #Inject
             for name, value in kwinject.items():
                 setattr(instance, name, value)
+            if before_init is not None:
+                before_init(instance)
 
             # Init must be called ourself since we are creating a cls instance and not a injector_cls instance.
             instance.__init__(*args, **kwargs)
 
             return instance
-    return Injector(*args, **kwargs)
+
+    return injecting_subclasses.setdefault(cls, Injector)
+
+
+def subclass_inject(cls, args, kwargs, kwinject, before_init: Optional[Callable[[Any], None]] = None):
+    """
+    Create a `cls` instance through its metaclass, with the `kwinject` attributes set between __new__ and __init__.
+    @param before_init: called with the instance right before __init__.
+    """
+    subclass = get_injecting_subclass(cls)
+
+    try:
+        stack = pending_injections.stack
+    except AttributeError:
+        stack = pending_injections.stack = []
+
+    depth = len(stack)
+    stack.append((kwinject, before_init))
+    try:
+        return subclass(*args, **kwargs)
+    finally:
+        # Left over if the metaclass did not call __new__
+        del stack[depth:]
+
+
+def new_inject(cls, args, kwargs, kwinject, before_init: Optional[Callable[[Any], None]] = None):
+    """
+    Same as subclass_inject, with no class created: the attributes are set between __new__ and __init__.
+    @param before_init: called with the instance right before __init__.
+    """
+    new = cls.__new__
+    if new is object.__new__:
+        instance = new(cls)
+    else:
+        instance = new(cls, *args, **kwargs)
+
+    for name, value in kwinject.items():
+        setattr(instance, name, value)
+    if before_init is not None:
+        before_init(instance)
+
+    instance.__init__(*args, **kwargs)
+    return instance
+
+
+def attribute_inject(cls, args, kwargs, kwinject, before_init: Optional[Callable[[Any], None]] = None):
+    # A metaclass with its own __call__ must run, so it still requires a subclass
+    if type(cls).__call__ is type.__call__:
+        return new_inject(cls, args, kwargs, kwinject, before_init)
+    return subclass_inject(cls, args, kwargs, kwinject, before_init)
+
+
+class InjectedAttribute:
+    """
+    Replaces an INJECTED class attribute in lazy attributes mode. The dependency is created on first access and kept
+    in the instance __dict__, which hides the descriptor from then on.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return INJECTED
+
+        resolve = attribute_resolvers.get(instance)
+        if resolve is None:
+            return INJECTED
+
+        value = instance.__dict__[self.name] = resolve(self.name)
+        return value
+
+
+class AttributeResolvers:
+    """
+    Function that creates the lazy attributes of each instance. They are kept here rather than in the instances,
+    which can still be pickled. The instances are referenced weakly and by id, since they may not be hashable.
+    """
+
+    def __init__(self):
+        self.entries = {}  # type: Dict[int, Tuple[ref, Callable[[str], Any]]]
+
+    def set(self, instance, resolve: Callable[[str], Any]):
+        key = id(instance)
+
+        def forget(_):
+            self.entries.pop(key, None)
+
+        self.entries[key] = (ref(instance, forget), resolve)
+
+    def get(self, instance) -> Optional[Callable[[str], Any]]:
+        entry = self.entries.get(id(instance))
+        if entry is None or entry[0]() is not instance:
+            return None
+        return entry[1]
+
+
+attribute_resolvers = AttributeResolvers()
+
+descriptor_classes = WeakKeyDictionary()
+
+
+def install_attribute_descriptors(cls, names: Sequence[str]):
+    """
+    Replace the INJECTED class attributes named in `names` by InjectedAttribute descriptors, once per class.
+    """
+    if cls in descriptor_classes:
+        return
+
+    for name in names:
+        for owner in cls.__mro__:
+            if name in owner.__dict__:
+                if owner.__dict__[name] is INJECTED:
+                    setattr(owner, name, InjectedAttribute(name))
+                break
+
+    descriptor_classes[cls] = True
+
+
+def supports_lazy_attributes(cls) -> bool:
+    """
+    The values of lazy attributes are kept in the instance __dict__, and their resolver needs a weak reference.
+    """
+    return isinstance(cls, type) and cls.__dictoffset__ != 0 and cls.__weakrefoffset__ != 0
+
+
+@memoized
+def get_private_deps(cls) -> Sequence[Arg]:
+    return get_cached_class_entry('private', cls, collect_private_deps)
+
+
+def collect_private_deps(cls) -> Sequence[Arg]:
+    return get_attribute_deps(cls) + get_signature_deps(cls)
+
+
+def get_injecting_constructor(cls, before_init: Optional[Callable[[Any], None]] = None) -> Callable:
+    """
+    @return: A callable equivalent to `instantiate_class` that takes the instance args and the dependencies as plain
+    arguments.
+    @param before_init: called with each instance right before __init__.
+    """
+    private = tuple(arg.name for arg in get_private_deps(cls))
+    init_injection = has_init_injection(cls)
+
+    def constructor(*args, **kwargs):
+        priv_deps = {}
+        for name in private:
+            if name in kwargs:
+                priv_deps[name] = kwargs.pop(name)
+
+        return construct(cls, args, kwargs, priv_deps, init_injection, before_init)
+
+    return constructor
+
+
+def construct(cls, args, kwargs, priv_deps, init_injection: bool, before_init: Optional[Callable[[Any], None]]):
+    if init_injection and priv_deps:
+        kwargs = {DEPENDENCIES_ARG: priv_deps, **kwargs}
+        priv_deps = {}
+
+    if before_init is not None:
+        return attribute_inject(cls, args, kwargs, priv_deps, before_init)
+    if priv_deps:
+        return attribute_inject(cls, args, kwargs, priv_deps)
+    return cls(*args, **kwargs)
 
 
 def instantiate_class(cls, instance_args: Optional[FunctionArgs] = None, **deps):
+    return create_instance(cls, instance_args, deps)
+
 
-    priv_args = get_attribute_deps(cls)
-    priv_args += get_signature_deps(cls)
+def create_instance(cls, instance_args: Optional[FunctionArgs], deps: Dict[str, Any],
+                    before_init: Optional[Callable[[Any], None]] = None):
+    """
+    Same as `instantiate_class`.
+    @param before_init: called with the instance right before __init__.
+    """
+    priv_args = get_private_deps(cls)
 
     # Collect priv args
     priv_deps = {}
@@ -175,10 +520,5 @@ def instantiate_class(cls, instance_args: Optional[FunctionArgs] = None, **deps)
         kwargs = {}
 
     # Instance
-    if priv_deps:
-        if has_init_injection(cls):
-            return cls(*args, **{DEPENDENCIES_ARG: priv_deps, **pub_deps, **kwargs})
-        else:
-            return subclass_inject(cls, args, {**pub_deps, **kwargs}, priv_deps)
-    else:
-        return cls(*args, **{**pub_deps, **kwargs})
+    return construct(cls, args, {**pub_deps, **kwargs}, priv_deps, bool(priv_deps) and has_init_injection(cls),
+                     before_init)
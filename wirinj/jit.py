@@ -0,0 +1,83 @@
+import linecache
+from itertools import count
+from typing import Callable, Any, Dict, List
+from weakref import finalize
+
+from .core import FunctionArgs
+from .plan import ResolutionPlan
+from .tools import get_cls_name
+
+_counter = count(1)
+
+
+class PlanCompiler:
+    """
+    Generates a Python function that runs a resolution plan.
+
+    Known instances, such as values and created singletons, are inlined as constants. The rest of the steps call
+    their constructor directly, or `get_instance` when the dependency has no constructor.
+    """
+
+    def __init__(self):
+        self.namespace = {'_FunctionArgs': FunctionArgs}  # type: Dict[str, Any]
+        self.names = {}  # type: Dict[int, str]
+        self.counter = 0
+
+    def bind(self, obj, prefix: str) -> str:
+        name = self.names.get(id(obj))
+        if name is None:
+            self.counter += 1
+            name = self.names[id(obj)] = '{}{}'.format(prefix, self.counter)
+            self.namespace[name] = obj
+        return name
+
+    def gen_lines(self, plan: ResolutionPlan) -> List[str]:
+        lines = []
+        exprs = [self.bind(value, '_c') for value in plan.initial]
+        for index, step in plan.calls:
+            params = ''.join('{}={}, '.format(name, exprs[i]) for name, i in step.params)
+
+            if step.constructor is not None:
+                expr = '{}({}{})'.format(
+                    self.bind(step.constructor, '_k'),
+                    '*args, ' if step.root else '',
+                    params + ('**kwargs' if step.root else ''),
+                )
+            else:
+                expr = '{}.get_instance({}, {})'.format(
+                    self.bind(step.dep, '_d'),
+                    '_FunctionArgs(args, kwargs)' if step.root else 'None',
+                    params,
+                )
+
+            exprs[index] = 'v{}'.format(index)
+            lines.append('    {} = {}'.format(exprs[index], expr))
+
+        lines.append('    return {}'.format(exprs[-1]))
+        return lines
+
+    def compile(self, plan: ResolutionPlan) -> Callable:
+        cls = plan.steps[-1].path[-1].cls
+        name = 'get_{}'.format(get_cls_name(cls) if isinstance(cls, type) else 'instance')
+        if not name.isidentifier():
+            name = 'get_instance'
+
+        source = 'def {}(args, kwargs):\n{}\n'.format(name, '\n'.join(self.gen_lines(plan)))
+
+        # Register the source so tracebacks show the generated lines
+        filename = '<wirinj-jit-{}>'.format(next(_counter))
+        linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+
+        exec(compile(source, filename, 'exec'), self.namespace)
+        function = self.namespace[name]
+        function.__source__ = source
+        # Plans are compiled again after each invalidation, so the source goes away with the function
+        finalize(function, linecache.cache.pop, filename, None)
+        return function
+
+
+def compile_plan(plan: ResolutionPlan) -> Callable:
+    """
+    @return: A function `(args, kwargs)` equivalent to calling the plan.
+    """
+    return PlanCompiler().compile(plan)
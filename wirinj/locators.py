@@ -1,4 +1,4 @@
-from typing import Sequence, Optional
+from typing import Sequence, Optional, Iterable, Any
 
 from .core import Locator, Arg, Dependency
 
@@ -18,6 +18,18 @@ class LocatorChain(Locator):
                 return result
         return None
 
+    def override(self, key, value) -> bool:
+        for finder in self.locator_list:
+            if finder.override(key, value):
+                return True
+        return False
+
+    def get_roots(self) -> Sequence[Any]:
+        roots = []
+        for finder in self.locator_list:
+            roots += [cls for cls in finder.get_roots() if cls not in roots]
+        return roots
+
 
 class LocatorCache(Locator):
     def __init__(self, locator: Locator):
@@ -29,12 +41,26 @@ class LocatorCache(Locator):
 
     def get(self, creation_path: Sequence[Arg]) -> Optional[Dependency]:
 
-        key = hash(creation_path)
-
         try:
-            return self.cache[key]
+            return self.cache[creation_path]
 
         except KeyError as ex:
             result = self.real_locator.get(creation_path)
-            self.cache[key] = result
+            self.cache[creation_path] = result
             return result
+
+    def peek(self, creation_path: Sequence[Arg]) -> Optional[Dependency]:
+        """
+        Return the cached dependency without locating it.
+        """
+        return self.cache.get(creation_path)
+
+    def override(self, key, value) -> bool:
+        return self.real_locator.override(key, value)
+
+    def get_roots(self) -> Sequence[Any]:
+        return self.real_locator.get_roots()
+
+    def invalidate(self, creation_paths: Iterable[Sequence[Arg]]):
+        for creation_path in creation_paths:
+            self.cache.pop(creation_path, None)
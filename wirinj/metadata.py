@@ -0,0 +1,192 @@
+import atexit
+import os
+import pickle
+import sys
+from threading import Lock
+from typing import Optional, Callable, Sequence, Dict, Tuple, Any, Iterable
+
+from .core import logger, Arg, NotSet
+
+# 2: entries with default values other than literals are not written
+FORMAT_VERSION = 2
+
+# Default values which are the same object, or an equivalent one, once unpickled
+LITERAL_TYPES = (bool, int, float, complex, str, bytes, type(None))
+
+FileStamp = Tuple[int, int]
+
+
+def get_source_path(obj) -> Optional[str]:
+    """
+    Stable name of a module level class or function, or None when it cannot be cached between processes.
+    """
+    qualname = getattr(obj, '__qualname__', None)
+    module = getattr(obj, '__module__', None)
+    if not qualname or not module or '<locals>' in qualname or '<lambda>' in qualname:
+        return None
+    return '{}:{}'.format(module, qualname)
+
+
+def has_literal_defaults(args: Iterable[Arg]) -> bool:
+    return all(arg.default is NotSet or type(arg.default) in LITERAL_TYPES for arg in args)
+
+
+class MetadataCache:
+    """
+    Persistent cache of the introspection results: the dependencies of classes and the arguments of functions.
+
+    The file is loaded with a single read. Its entries are only decoded when they are requested and are checked
+    against the modification time and size of the source files they were computed from, so an edited module is
+    introspected again. New entries are written back by `save`, which also runs at process exit.
+    """
+
+    def __init__(self, path: str, autosave=True):
+        self.path = path
+        self.lock = Lock()
+        self.entries = self._load()  # type: Dict[str, bytes]
+        self.decoded = {}
+        self.dirty = False
+        self.file_stamps = {}  # type: Dict[str, Optional[FileStamp]]
+        self.hits = 0
+        self.misses = 0
+
+        if autosave:
+            atexit.register(self.save)
+
+    def _load(self) -> Dict[str, bytes]:
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as ex:
+            logger.warning('Ignoring unreadable metadata cache {}: {}'.format(self.path, ex))
+            return {}
+
+        if not isinstance(data, dict) or data.get('format') != FORMAT_VERSION or \
+                data.get('python') != tuple(sys.version_info[:2]):
+            return {}
+
+        return data['entries']
+
+    def save(self):
+        """
+        Write the cache file if there are new entries. Entries written meanwhile by other processes are kept.
+        """
+        with self.lock:
+            if not self.dirty:
+                return
+
+            entries = {**self._load(), **self.entries}
+            data = {
+                'format': FORMAT_VERSION,
+                'python': tuple(sys.version_info[:2]),
+                'entries': entries,
+            }
+
+            tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+
+            self.entries = entries
+            self.dirty = False
+
+    def get_class_dependencies(self, cls, collect: Callable[[Any], Sequence[Arg]]) -> Sequence[Arg]:
+        return self.get_class_entry('class', cls, collect)
+
+    def get_class_entry(self, kind: str, cls, collect: Callable[[Any], Sequence[Arg]]) -> Sequence[Arg]:
+        """
+        @param kind: name of the introspection result, e.g. 'class' for all the dependencies of the class.
+        """
+        source_path = get_source_path(cls)
+        if source_path is None:
+            return collect(cls)
+
+        modules = [base.__module__ for base in cls.__mro__ if base.__module__ != 'builtins']
+        return list(self._get('{}:{}'.format(kind, source_path), modules, lambda: tuple(collect(cls))))
+
+    def get_func_args(self, func: Callable, collect: Callable[[Callable], Sequence[Arg]]) -> Sequence[Arg]:
+        source_path = get_source_path(func)
+        if source_path is None:
+            return collect(func)
+
+        return list(self._get('func:' + source_path, (func.__module__,), lambda: tuple(collect(func))))
+
+    def _get(self, key: str, modules: Iterable[str], collect: Callable[[], Any]) -> Any:
+        try:
+            return self.decoded[key]
+        except KeyError:
+            pass
+
+        stamps = self._get_stamps(modules)
+        if stamps is None:
+            return collect()
+
+        blob = self.entries.get(key)
+        if blob is not None:
+            try:
+                entry_stamps, value = pickle.loads(blob)
+            except Exception:
+                entry_stamps, value = None, None
+            if entry_stamps == stamps:
+                self.hits += 1
+                self.decoded[key] = value
+                return value
+
+        self.misses += 1
+        value = collect()
+        self.decoded[key] = value
+
+        if not has_literal_defaults(value):
+            # Unpickling would give a copy of the default object, e.g. of a sentinel. It is just kept in memory.
+            return value
+
+        try:
+            blob = pickle.dumps((stamps, value), protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # Not picklable, e.g. a default value which is a lambda. It is just kept in memory.
+            return value
+
+        with self.lock:
+            self.entries[key] = blob
+            self.dirty = True
+        return value
+
+    def _get_stamps(self, modules: Iterable[str]) -> Optional[Tuple]:
+        stamps = {}
+        for module_name in modules:
+            file = getattr(sys.modules.get(module_name), '__file__', None)
+            if not file:
+                return None
+
+            try:
+                stamp = self.file_stamps[file]
+            except KeyError:
+                try:
+                    stat = os.stat(file)
+                    stamp = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    stamp = None
+                self.file_stamps[file] = stamp
+
+            if stamp is None:
+                return None
+            stamps[file] = stamp
+
+        return tuple(sorted(stamps.items()))
+
+
+active_cache = None  # type: Optional[MetadataCache]
+
+
+def set_active_cache(cache: Optional[MetadataCache]):
+    """
+    Use `introspect.use_metadata_cache`, which also forgets the results computed without it.
+    """
+    global active_cache
+    active_cache = cache
+
+
+def get_active_cache() -> Optional[MetadataCache]:
+    return active_cache
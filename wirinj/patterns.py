@@ -0,0 +1,172 @@
+from typing import Sequence, Optional, Iterable, FrozenSet, Tuple
+
+from .core import Arg
+from .imports import ImportRef, as_import_ref
+
+
+class PathWildcard:
+    """
+    Definition key element matching any single element of the creation path.
+    """
+
+    def matches(self, arg: Arg) -> bool:
+        return True
+
+    def __repr__(self):
+        return 'ANY'
+
+
+class PathGap:
+    """
+    Definition key element matching zero or more consecutive elements of the creation path.
+    """
+
+    def __repr__(self):
+        return 'ANCESTORS'
+
+
+ANY = PathWildcard()
+ANCESTORS = PathGap()
+
+
+class SubclassOf:
+    """
+    Definition key element matching an argument whose type annotation is the given class or any subclass of it.
+    """
+
+    def __init__(self, cls):
+        self.cls = as_import_ref(cls)
+
+    def matches(self, arg: Arg) -> bool:
+        if not isinstance(arg.cls, type):
+            return False
+
+        # Compare the import paths to avoid importing a lazy referenced class
+        if isinstance(self.cls, ImportRef):
+            for base in arg.cls.__mro__:
+                if self.cls.matches(base):
+                    return True
+            return False
+
+        return issubclass(arg.cls, self.cls)
+
+    def __eq__(self, other):
+        return isinstance(other, SubclassOf) and other.cls == self.cls
+
+    def __hash__(self):
+        return hash((SubclassOf, self.cls))
+
+    def __repr__(self):
+        return '{}({})'.format(SubclassOf.__name__, getattr(self.cls, '__name__', repr(self.cls)))
+
+
+def is_pattern_item(item) -> bool:
+    return item is ANY or item is ANCESTORS or isinstance(item, SubclassOf)
+
+
+def is_pattern(definition: Sequence) -> bool:
+    for item in definition:
+        if is_pattern_item(item):
+            return True
+    return False
+
+
+def item_matches(item, arg: Arg) -> bool:
+    if item is ANY or isinstance(item, SubclassOf):
+        return item.matches(arg)
+
+    if isinstance(item, ImportRef):
+        return item.matches(arg.cls)
+
+    # A string matches the argument name, anything else the argument type annotation
+    return isinstance(item, str) and item == arg.name or item == arg.cls
+
+
+NfaState = Tuple[int, int]
+
+
+class PatternState:
+    def __init__(self, nfa_states: FrozenSet[NfaState], entry):
+        self.nfa_states = nfa_states
+        self.entry = entry
+        self.transitions = {}
+
+
+class PatternAutomaton:
+    """
+    Pattern keys compiled into a deterministic automaton that reads the creation path backwards.
+
+    The automaton states are built on demand by subset construction and then memoized together with their
+    transitions. Once warm, a lookup takes one step per creation path element no matter how many patterns there are.
+    """
+
+    def __init__(self, entries: Iterable):
+        self.entries = list(entries)
+        self.segments = [tuple(reversed(entry.definition)) for entry in self.entries]
+        self.states = {}
+        self.start = self._get_state(self._closure((pattern, 0) for pattern in range(len(self.entries))))
+
+    def _closure(self, nfa_states: Iterable[NfaState]) -> FrozenSet[NfaState]:
+        result = set()
+        pending = list(nfa_states)
+        while pending:
+            nfa_state = pending.pop()
+            if nfa_state in result:
+                continue
+            result.add(nfa_state)
+
+            # A gap may match nothing at all
+            pattern, pos = nfa_state
+            segments = self.segments[pattern]
+            if pos < len(segments) and segments[pos] is ANCESTORS:
+                pending.append((pattern, pos + 1))
+
+        return frozenset(result)
+
+    def _get_state(self, nfa_states: FrozenSet[NfaState]) -> PatternState:
+        state = self.states.get(nfa_states)
+        if state is None:
+            entry = None
+            for pattern, pos in nfa_states:
+                if pos == len(self.segments[pattern]):
+                    candidate = self.entries[pattern]
+                    if entry is None or candidate.beats(entry):
+                        entry = candidate
+            state = self.states[nfa_states] = PatternState(nfa_states, entry)
+        return state
+
+    def _step(self, state: PatternState, arg: Arg) -> PatternState:
+        targets = []
+        for pattern, pos in state.nfa_states:
+            segments = self.segments[pattern]
+            if pos == len(segments):
+                continue
+            segment = segments[pos]
+            if segment is ANCESTORS:
+                targets.append((pattern, pos))
+            elif item_matches(segment, arg):
+                targets.append((pattern, pos + 1))
+        return self._get_state(self._closure(targets))
+
+    def find(self, creation_path: Sequence[Arg]) -> Optional[object]:
+        result = None
+        state = self.start
+
+        for arg in reversed(creation_path):
+            symbol = (arg.name, arg.cls)
+            try:
+                next_state = state.transitions.get(symbol)
+                if next_state is None:
+                    next_state = state.transitions[symbol] = self._step(state, arg)
+            except TypeError:
+                # Unhashable annotation, the transition cannot be memoized
+                next_state = self._step(state, arg)
+
+            state = next_state
+            if not state.nfa_states:
+                break
+
+            if state.entry is not None and (result is None or state.entry.beats(result)):
+                result = state.entry
+
+        return result
@@ -0,0 +1,155 @@
+from typing import Sequence, Optional, Callable, Dict, Tuple, Any
+
+from .core import NotSet, FunctionArgs, Arg, logger, SEPARATOR_OPEN, SEPARATOR_CLOSE
+
+Shape = Tuple[Any, int, Tuple[str, ...]]
+
+
+def get_shape(cls, args: Sequence, kwargs: Dict) -> Shape:
+    """
+    Requested class and call signature: number of positional arguments and names of the keyword arguments.
+    """
+    return cls, len(args), tuple(kwargs)
+
+
+class PlanStep:
+    """
+    Creation of one node of the dependency tree.
+    @param params: (argument name, index of the step that creates it) pairs.
+    """
+
+    def __init__(self, dep, params: Sequence[Tuple[str, int]], root: bool, path: Sequence[Arg]):
+        self.dep = dep
+        self.constant = dep.get_constant()
+        self.singleton = dep.is_singleton()
+        self.constructor = dep.get_constructor() if self.constant is NotSet else None
+        self.params = tuple(params)
+        self.root = root
+        self.path = tuple(path)
+
+    def get_path_text(self) -> str:
+        return ' -> '.join(str(arg) for arg in self.path)
+
+
+class ResolutionPlan:
+    """
+    Immutable list of the steps that create a dependency tree, children first.
+    Values and created singletons are known beforehand, so only the other steps are run.
+    """
+
+    def __init__(self, steps: Sequence[PlanStep]):
+        self.steps = tuple(steps)
+        self.initial = tuple(step.constant for step in self.steps)
+        self.calls = tuple((index, step) for index, step in enumerate(self.steps) if step.constant is NotSet)
+
+    @classmethod
+    def build(cls, root, kwargs: Dict) -> Optional['ResolutionPlan']:
+        """
+        @param root: successfully created root CreationNode.
+        @param kwargs: keyword arguments of the call that created the tree.
+        @return: The plan, or None if the tree depends on the value of the keyword arguments and not only on their
+        names, or if it has dependencies created by coroutine functions.
+        """
+        # A keyword argument equal to the default value is still injected
+        for arg in root.dep.get_dependencies() or ():
+            if arg.name in kwargs and arg.default is not NotSet:
+                return None
+
+        steps = []
+        cls._add_steps(steps, root, (), True)
+
+        # Coroutine functions are awaited by the injector, not by plans
+        if any(step.dep.is_async() for _, step in cls(steps).calls):
+            return None
+
+        return cls(steps)
+
+    @classmethod
+    def _add_steps(cls, steps, node, parent_path, root=False) -> int:
+        path = tuple(parent_path) + (node.arg,)
+        params = []
+        if node.dep.get_constant() is NotSet:
+            for child in node.childs:
+                params.append((child.arg.name, cls._add_steps(steps, child, path)))
+
+        steps.append(PlanStep(node.dep, params, root, path))
+        return len(steps) - 1
+
+    def get_singletons(self) -> Sequence[PlanStep]:
+        return [step for step in self.steps if step.singleton]
+
+    def __call__(self, args, kwargs):
+        values = list(self.initial)
+        for index, step in self.calls:
+            params = {name: values[i] for name, i in step.params}
+            try:
+                if step.constructor is None:
+                    values[index] = step.dep.get_instance(FunctionArgs(args, kwargs) if step.root else None, **params)
+                elif step.root:
+                    values[index] = step.constructor(*args, **params, **kwargs)
+                else:
+                    values[index] = step.constructor(**params)
+            except BaseException as ex:
+                logger.fatal(SEPARATOR_OPEN)
+                logger.fatal('Instantiation ERROR:')
+                logger.fatal('{} [{}]'.format(step.get_path_text(), ex.__class__.__name__))
+                logger.fatal(SEPARATOR_CLOSE)
+                raise
+        return values[-1]
+
+
+class PlanCache:
+    """
+    Resolution plans of the injector, by requested class and call signature.
+    """
+
+    def __init__(self, compiler: Optional[Callable[[ResolutionPlan], Callable]] = None, jit=False):
+        """
+        @param compiler: turns a plan into a faster function with the same signature, e.g. the JIT compiler.
+        @param jit: if True, every plan is compiled. Otherwise, the plans are interpreted and nothing is compiled.
+        """
+        self.compiler = compiler
+        self.jit = jit
+        self.plans = {}  # type: Dict[Shape, Optional[ResolutionPlan]]
+        self.runners = {}  # type: Dict[Shape, Callable]
+        self.compiled = {}  # type: Dict[Shape, Callable]
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, shape: Shape) -> Optional[Callable]:
+        runner = self.runners.get(shape)
+        if runner is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return runner
+
+    def get_compiled(self, shape: Shape) -> Optional[Callable]:
+        """
+        The function that runs the plan, for callers that skip `get`, e.g. factories: the compiled plan in JIT mode,
+        or the plan itself.
+        """
+        function = self.compiled.get(shape)
+        if function is None:
+            plan = self.plans.get(shape)
+            if plan is None:
+                return None
+            function = self.compiled[shape] = self.compiler(plan) if self.compiler and self.jit else plan
+        return function
+
+    def add(self, shape: Shape, root, kwargs: Dict):
+        # Shapes with no plan are kept as None so they are not tried again
+        if shape in self.plans:
+            return
+
+        plan = self.plans[shape] = ResolutionPlan.build(root, kwargs)
+        if plan is not None:
+            self.runners[shape] = self.get_compiled(shape) if self.jit else plan
+
+    def clear(self):
+        self.plans.clear()
+        self.runners.clear()
+        self.compiled.clear()
+
+    def __len__(self):
+        return len(self.runners)
@@ -0,0 +1,152 @@
+import operator
+from threading import Lock
+from typing import Callable, Any
+
+from .core import NotSet
+
+
+class Proxy:
+    """
+    Stand-in for an object which is only obtained the first time it is used.
+    Attribute access, calls, comparisons, arithmetic and the other operators, conversions such as `int()`, and the
+    container and context manager protocols are forwarded to the object, which is kept afterwards.
+    `isinstance` works as well, but it obtains the object. `type()` and `is` see the proxy.
+    """
+    __slots__ = ('_proxy_resolve', '_proxy_target', '_proxy_lock')
+
+    def __init__(self, resolve: Callable[[], Any]):
+        object.__setattr__(self, '_proxy_resolve', resolve)
+        object.__setattr__(self, '_proxy_target', NotSet)
+        object.__setattr__(self, '_proxy_lock', Lock())
+
+    def _proxy_get(self):
+        target = object.__getattribute__(self, '_proxy_target')
+        if target is NotSet:
+            with object.__getattribute__(self, '_proxy_lock'):
+                target = object.__getattribute__(self, '_proxy_target')
+                if target is NotSet:
+                    target = object.__getattribute__(self, '_proxy_resolve')()
+                    object.__setattr__(self, '_proxy_target', target)
+        return target
+
+    @property
+    def __class__(self):
+        return type(self._proxy_get())
+
+    def __getattr__(self, name):
+        return getattr(self._proxy_get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._proxy_get(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._proxy_get(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._proxy_get()(*args, **kwargs)
+
+    def __repr__(self):
+        if object.__getattribute__(self, '_proxy_target') is NotSet:
+            return '<{} (not resolved)>'.format(Proxy.__name__)
+        return repr(self._proxy_get())
+
+    def __str__(self):
+        return str(self._proxy_get())
+
+    def __bool__(self):
+        return bool(self._proxy_get())
+
+    def __len__(self):
+        return len(self._proxy_get())
+
+    def __iter__(self):
+        return iter(self._proxy_get())
+
+    def __contains__(self, item):
+        return item in self._proxy_get()
+
+    def __getitem__(self, key):
+        return self._proxy_get()[key]
+
+    def __setitem__(self, key, value):
+        self._proxy_get()[key] = value
+
+    def __delitem__(self, key):
+        del self._proxy_get()[key]
+
+    def __eq__(self, other):
+        return self._proxy_get() == other
+
+    def __ne__(self, other):
+        return self._proxy_get() != other
+
+    def __hash__(self):
+        return hash(self._proxy_get())
+
+    def __enter__(self):
+        return self._proxy_get().__enter__()
+
+    def __exit__(self, *exc_info):
+        return self._proxy_get().__exit__(*exc_info)
+
+    def __dir__(self):
+        return dir(self._proxy_get())
+
+    def __format__(self, format_spec):
+        return format(self._proxy_get(), format_spec)
+
+    def __reversed__(self):
+        return reversed(self._proxy_get())
+
+    def __round__(self, *ndigits):
+        return round(self._proxy_get(), *ndigits)
+
+    def __divmod__(self, other):
+        return divmod(self._proxy_get(), other)
+
+    def __rdivmod__(self, other):
+        return divmod(other, self._proxy_get())
+
+
+def _set_forwarders():
+    def unary(func):
+        return lambda self: func(self._proxy_get())
+
+    def binary(func):
+        return lambda self, other: func(self._proxy_get(), other)
+
+    def reflected(func):
+        return lambda self, other: func(other, self._proxy_get())
+
+    for name in ('lt', 'le', 'gt', 'ge'):
+        setattr(Proxy, '__{}__'.format(name), binary(getattr(operator, name)))
+
+    for name in ('add', 'sub', 'mul', 'matmul', 'truediv', 'floordiv', 'mod', 'pow', 'lshift', 'rshift', 'and',
+                 'xor', 'or'):
+        func = getattr(operator, name) if hasattr(operator, name) else getattr(operator, name + '_')
+        setattr(Proxy, '__{}__'.format(name), binary(func))
+        setattr(Proxy, '__r{}__'.format(name), reflected(func))
+        # The result replaces the proxy in the variable, as with immutable objects
+        setattr(Proxy, '__i{}__'.format(name), binary(getattr(operator, 'i' + name)))
+
+    for name in ('neg', 'pos', 'abs', 'invert', 'index'):
+        setattr(Proxy, '__{}__'.format(name), unary(getattr(operator, name)))
+
+    for func in (int, float, complex, bytes):
+        setattr(Proxy, '__{}__'.format(func.__name__), unary(func))
+
+
+_set_forwarders()
+
+
+def is_resolved(proxy: Proxy) -> bool:
+    return object.__getattribute__(proxy, '_proxy_target') is not NotSet
+
+
+def resolve_proxy(obj):
+    """
+    @return: The object behind a proxy, or `obj` itself if it is not a proxy.
+    """
+    if type(obj) is Proxy:
+        return obj._proxy_get()
+    return obj
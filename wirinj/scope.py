@@ -0,0 +1,19 @@
+from typing import Dict, Any
+
+from .core import Dependency
+
+
+class Scope:
+    """
+    Instances of the `Scoped` dependencies created within an `Injector.scope()` block.
+    """
+
+    def __init__(self):
+        self.instances = {}  # type: Dict[Dependency, Any]
+
+    def close(self):
+        # Released in bulk
+        self.instances.clear()
+
+    def __len__(self):
+        return len(self.instances)
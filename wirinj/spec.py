@@ -0,0 +1,91 @@
+import pickle
+import sys
+from typing import Sequence, Dict, Any, Optional, Union
+
+from .errors import WirinjError
+from .imports import import_by_path
+from .plan import Shape
+
+
+class InjectorSpec:
+    """
+    Picklable description of an injector, to create an equivalent one in another process.
+    @param locators: import paths of the locators, or the locators themselves if they can be pickled.
+    @param options: keyword arguments of the Injector.
+    @param shapes: requested classes and functions with their call signature, whose dependencies are located
+    beforehand by the new injector.
+    """
+
+    def __init__(self, locators: Sequence[Union[str, Any]], options: Dict[str, Any], shapes: Sequence[Shape]):
+        self.locators = list(locators)
+        self.options = dict(options)
+        self.shapes = list(shapes)
+
+    def get_locators(self):
+        return [import_by_path(item) if isinstance(item, str) else item for item in self.locators]
+
+
+def find_import_path(obj) -> Optional[str]:
+    """
+    @return: The 'module:attribute' path of a module global which is `obj`, or None. Modules other than __main__ are
+    preferred, since the __main__ of a worker process may not be the same.
+    """
+    main = None
+    for module_name, module in list(sys.modules.items()):
+        if module is None:
+            continue
+        for name, value in list(getattr(module, '__dict__', {}).items()):
+            if value is obj:
+                path = '{}:{}'.format(module_name, name)
+                if module_name != '__main__':
+                    return path
+                main = main or path
+    return main
+
+
+def is_importable(obj) -> bool:
+    """
+    True if `obj` is pickled by reference: a class or function reachable through its module and qualified name.
+    """
+    module = getattr(obj, '__module__', None)
+    qualname = getattr(obj, '__qualname__', None)
+    if not module or not qualname or '<' in qualname:
+        return False
+    try:
+        return import_by_path('{}:{}'.format(module, qualname)) is obj
+    except (ImportError, AttributeError):
+        return False
+
+
+def get_locator_reference(locator) -> Union[str, Any]:
+    """
+    @return: The import path of `locator`, or `locator` itself if it can be pickled.
+    """
+    path = find_import_path(locator)
+    if path is not None:
+        return path
+
+    try:
+        pickle.dumps(locator)
+    except Exception as ex:
+        raise WirinjError('{} cannot be pickled ({}). Assign it to a module global, so it is referenced by its '
+                          'import path.'.format(locator.__class__.__name__, ex))
+    return locator
+
+
+# Injector of the current worker process, set by Injector.initializer
+worker_injector = None
+
+
+def set_worker_injector(injector):
+    global worker_injector
+    worker_injector = injector
+
+
+def get_worker_injector():
+    """
+    @return: The injector created by `Injector.initializer` in the current worker process.
+    """
+    if worker_injector is None:
+        raise WirinjError('No worker injector. Pass Injector.initializer as initializer of the pool.')
+    return worker_injector
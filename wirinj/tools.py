@@ -1,30 +1,88 @@
-from typing import Type
+from itertools import repeat
+from types import FunctionType
+from typing import Type, Union, Iterable, Sequence
 
 
-def get_subclassing_factory(cls, func):
+def iter_many(func, cls, n_or_iterable: Union[int, Iterable[Sequence]]):
+    if isinstance(n_or_iterable, int):
+        n_or_iterable = repeat((), n_or_iterable)
+
+    for args in n_or_iterable:
+        yield func(cls, *args)
+
+
+def get_many_func(func):
+    """
+    Default implementation of `many` for factories: one call of `func` per object.
+    """
+
+    def many_func(cls, n_or_iterable, stream=False):
+        instances = iter_many(func, cls, n_or_iterable)
+        return instances if stream else list(instances)
+
+    return many_func
+
+
+def get_subclassing_factory(cls, func, many_func=None):
+    """
+    @param many_func: `(cls, n_or_iterable, stream=False)` function behind the `many` method of the factory.
+    """
     base_cls = cls
+    many_func = many_func or get_many_func(func)
 
     class FactoryMeta(cls.__class__):
         def __call__(cls, *args, **kwargs):
             return func(base_cls, *args, **kwargs)
 
+        def many(cls, n_or_iterable, stream=False):
+            return many_func(base_cls, n_or_iterable, stream)
+
     class Factory(cls, metaclass=FactoryMeta):
         pass
 
     return Factory
 
 
-def get_func_factory(cls, func):
+def get_func_factory(cls, func, many_func=None):
     base_cls = cls
+    many_func = many_func or get_many_func(func)
 
     def factory(*args, **kwargs):
         return func(base_cls, *args, **kwargs)
 
+    def many(n_or_iterable, stream=False):
+        return many_func(base_cls, n_or_iterable, stream)
+
+    factory.many = many
     return factory
 
 
+class LazyType:
+    """
+    `Lazy[T]` annotation: a proxy of `T` which creates it on first use is injected.
+    """
+
+    def __init__(self, cls):
+        self.cls = cls
+
+    @property
+    def __name__(self):
+        return 'Lazy[{}]'.format(get_cls_name(self.cls))
+
+    def __eq__(self, other):
+        return isinstance(other, LazyType) and other.cls == self.cls
+
+    def __hash__(self):
+        return hash((LazyType, self.cls))
+
+    def __repr__(self):
+        return self.__name__
+
+
 def is_typing_type(cls):
-    return cls.__class__ is Type.__class__ and getattr(cls, '_name', getattr(cls, '__name__', None)) == 'Type'
+    # Python 3.6 keeps Type as origin of Type[...], later versions use the builtin type
+    origin = getattr(cls, '__origin__', None)
+    return origin is Type or origin is type
 
 def is_typing_clause(cls):
     return cls.__module__ == 'typing'
@@ -42,3 +100,11 @@ def get_cls_name(cls):
         return 'Type[{}]'.format(args.__name__)
     else:
         return cls.__name__
+
+
+def is_module_function(func) -> bool:
+    """
+    Check if `func` is a function defined at module or class level, which lives as long as its module.
+    """
+    qualname = getattr(func, '__qualname__', '')
+    return type(func) is FunctionType and '<locals>' not in qualname and '<lambda>' not in qualname
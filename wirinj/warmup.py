@@ -0,0 +1,63 @@
+from typing import Sequence, Optional, List, Set
+
+from .core import Arg, Dependency, SEPARATOR_OPEN, SEPARATOR_CLOSE
+
+
+class WarmupStep:
+    """
+    Creation of one singleton, once the singletons it depends on are created.
+    """
+
+    def __init__(self, dep: Dependency, parent_path: Sequence[Arg], arg: Arg, path_text: str):
+        self.dep = dep
+        self.parent_path = tuple(parent_path)
+        self.arg = arg
+        self.path_text = path_text
+        self.requires = set()  # type: Set[WarmupStep]
+        self.seconds = None  # type: Optional[float]
+        self.error = None  # type: Optional[BaseException]
+        self.fork_safe = True
+
+    def __hash__(self):
+        return id(self)
+
+    def __eq__(self, other):
+        return self is other
+
+
+class WarmupReport:
+    """
+    Singletons created by `Injector.warmup`, in creation order, with the time spent on each one.
+    """
+
+    def __init__(self, steps: List[WarmupStep], seconds: float):
+        self.steps = steps
+        self.seconds = seconds
+
+    @property
+    def failed(self) -> List[WarmupStep]:
+        return [step for step in self.steps if step.error is not None]
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+    def get(self) -> str:
+        lines = ''
+        for step in self.steps:
+            if step.error is not None:
+                result = 'failed [{}]'.format(step.error.__class__.__name__)
+            else:
+                result = '{:.1f} ms'.format(step.seconds * 1000)
+            lines += '    {}: {}\n'.format(step.path_text, result)
+
+        return '{0}\n{1}\n\n{2}\n    Total: {3:.1f} ms\n{4}'.format(
+            SEPARATOR_OPEN,
+            'Warmup report:',
+            lines,
+            self.seconds * 1000,
+            SEPARATOR_CLOSE,
+        )
+
+    def __str__(self):
+        return self.get()